@@ -0,0 +1,115 @@
+"""Benchmarks of the simulation engines: ``python -m bench run|compare``.
+
+``run`` appends one entry to a JSON history file, ``compare`` checks the last
+entry against the one before it (or against ``--baseline``) and exits with a
+non-zero status when a measurement regressed beyond ``--threshold``.
+Agreement measurements (unit "sigma") are checked against ``SIGMA_LIMIT``
+instead, whatever the baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from bench.cases import SUITES
+
+HISTORY_FILE = "bench/history.json"
+# Standard errors between an engine and an exact result beyond which they disagree
+SIGMA_LIMIT = 3.0
+
+
+def load_history(path: str) -> list[dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as history_file:
+        return json.load(history_file)
+
+
+def current_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    entry = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": current_commit(),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "quick": args.quick,
+        "results": {},
+    }
+    for suite in args.suites or SUITES:
+        for measurement in SUITES[suite](args.quick):
+            entry["results"][measurement.name] = measurement._asdict()
+            print(f"{measurement.name:55} {measurement.value:14.6g} {measurement.unit}", flush=True)
+
+    history = load_history(args.history)
+    history.append(entry)
+    os.makedirs(os.path.dirname(args.history) or ".", exist_ok=True)
+    with open(args.history, "w") as history_file:
+        json.dump(history, history_file, indent=2)
+
+
+def compare(args) -> int:
+    history = load_history(args.history)
+    if len(history) < 2:
+        print("Need at least two benchmark runs in the history to compare")
+        return 0
+    current = history[-1]
+    baseline = history[args.baseline] if args.baseline is not None else history[-2]
+
+    regressions = 0
+    for name, measurement in current["results"].items():
+        if measurement["unit"] == "sigma":
+            # Sampling noise alone moves a z by whole units from run to run, so only its size counts
+            flag = ""
+            if abs(measurement["value"]) > SIGMA_LIMIT:
+                flag = "DISAGREES"
+                regressions += 1
+            print(f"{name:55} {'':12}    {measurement['value']:12.6g} {'sigma':7} {'':8} {flag}")
+            continue
+        if name not in baseline["results"]:
+            continue
+        before, after = baseline["results"][name]["value"], measurement["value"]
+        if not before:
+            continue
+        # Positive change means slower, whatever the unit
+        change = (before - after) / before if measurement["higher_is_better"] else (after - before) / before
+        flag = ""
+        if change > args.threshold:
+            flag = "REGRESSION"
+            regressions += 1
+        elif change < -args.threshold:
+            flag = "improved"
+        print(f"{name:55} {before:12.6g} -> {after:12.6g} {measurement['unit']:7} {change:+8.1%} {flag}")
+    print(f"{regressions} regression(s) beyond {args.threshold:.0%} or {SIGMA_LIMIT:g} sigma")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__.splitlines()[0])
+    parser.add_argument("--history", default=HISTORY_FILE)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="run the benchmarks and append them to the history")
+    run_parser.add_argument("suites", nargs="*", help=f"any of {', '.join(SUITES)}; default: all")
+    run_parser.add_argument("--quick", action="store_true", help="smaller sizes, for a smoke test")
+    compare_parser = subparsers.add_parser("compare", help="compare the last run against a baseline")
+    compare_parser.add_argument("--baseline", type=int, default=None, help="history index of the baseline run")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown to flag")
+    args = parser.parse_args()
+    if args.command == "run":
+        if unknown := set(args.suites) - set(SUITES):
+            parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+main()
@@ -0,0 +1,193 @@
+import decimal
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+from sims.fighting import (
+    ENGINES as FIGHTING_ENGINES,
+    FightingSimBatch,
+    FightingSimConfig,
+    format_fighting_results,
+    simulate_battle,
+    simulate_battle_events,
+    simulate_battles,
+    simulate_battles_events,
+    solve_battle,
+)
+from sims.rng import SimulationStreams
+from sims.runner import Chunk, plan_chunks, run_chunks
+from sims.stats import BatchStats
+from sims.thieving import (
+    ENGINES as THIEVING_ENGINES,
+    ThievingSimBatch,
+    ThievingSimConfig,
+    format_thieve_results,
+    sim,
+    sim_events,
+    simulate_thieving_batch,
+)
+
+FIGHTING_CONFIGS = {
+    "default": FightingSimConfig(
+        player_health=720, player_health_regen=8, player_regen_interval=8,
+        player_damage_min=1, player_damage_max=111, player_hit_chance=0.76, player_attack_interval=3.0,
+        enemy_health=300, enemy_damage_min=0, enemy_damage_max=116, enemy_hit_chance=0.35, enemy_attack_interval=2.4,
+    ),
+    "long": FightingSimConfig(
+        player_health=720, player_health_regen=8, player_regen_interval=8,
+        player_damage_min=1, player_damage_max=111, player_hit_chance=0.76, player_attack_interval=3.0,
+        enemy_health=300, enemy_damage_min=0, enemy_damage_max=20, enemy_hit_chance=0.35, enemy_attack_interval=2.4,
+    ),
+}
+THIEVING_CONFIGS = {
+    "default": ThievingSimConfig(
+        health_regeneration_interval=8, health_regeneration_amount=8, max_health=720,
+        steal_interval=decimal.Decimal("2.6"), steal_success_chance=0.57,
+        min_damage=0, max_damage=157, min_gold=50, max_gold=1100,
+    ),
+    "long": ThievingSimConfig(
+        health_regeneration_interval=8, health_regeneration_amount=8, max_health=720,
+        steal_interval=decimal.Decimal("2.6"), steal_success_chance=0.9,
+        min_damage=0, max_damage=50, min_gold=50, max_gold=1100,
+    ),
+}
+
+
+class Measurement(NamedTuple):
+    name: str
+    value: float
+    unit: str
+    higher_is_better: bool
+
+
+def _best_time(fn: Callable, repeats: int) -> float:
+    """Best wall time of ``repeats`` calls; the minimum is the least noisy estimate."""
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def latency_cases(quick: bool) -> list[Measurement]:
+    """Mean single-run latency over a fixed, seeded set of runs (single runs vary too much in length)."""
+    runs = 20 if quick else 200
+    measurements = []
+    for name, config in FIGHTING_CONFIGS.items():
+        def fights():
+            np.random.seed(0)
+            for _ in range(runs):
+                simulate_battle(config)
+        measurements.append(Measurement(f"latency/simulate_battle/{name}", _best_time(fights, 3) / runs, "s", False))
+
+        def event_fights():
+            random.seed(0)
+            for _ in range(runs):
+                simulate_battle_events(config)
+        seconds = _best_time(event_fights, 3) / runs
+        measurements.append(Measurement(f"latency/simulate_battle_events/{name}", seconds, "s", False))
+    for name, config in THIEVING_CONFIGS.items():
+        for engine in (sim, sim_events):
+            engine_runs = max(runs // 20, 1) if engine is sim else runs
+
+            def thefts():
+                random.seed(0)
+                for _ in range(engine_runs):
+                    engine(config)
+            seconds = _best_time(thefts, 1 if engine is sim else 3) / engine_runs
+            measurements.append(Measurement(f"latency/{engine.__name__}/{name}", seconds, "s", False))
+    return measurements
+
+
+def throughput_cases(quick: bool) -> list[Measurement]:
+    n = 2_000 if quick else 20_000
+    measurements = []
+    for name, config in FIGHTING_CONFIGS.items():
+        seconds = _best_time(lambda: simulate_battles(config, n, SimulationStreams(0)), 3)
+        measurements.append(Measurement(f"throughput/simulate_battles/{name}", n / seconds, "runs/s", True))
+        seconds = _best_time(lambda: simulate_battles_events(config, n, SimulationStreams(0)), 3)
+        measurements.append(Measurement(f"throughput/simulate_battles_events/{name}", n / seconds, "runs/s", True))
+    for name, config in THIEVING_CONFIGS.items():
+        seconds = _best_time(lambda: simulate_thieving_batch(config, n, SimulationStreams(0)), 3)
+        measurements.append(Measurement(f"throughput/simulate_thieving_batch/{name}", n / seconds, "runs/s", True))
+        small = n // 100
+        seconds = _best_time(lambda: THIEVING_ENGINES["events"](config, small, SimulationStreams(0)), 1)
+        measurements.append(Measurement(f"throughput/sim_events/{name}", small / seconds, "runs/s", True))
+    return measurements
+
+
+def pool_scaling_cases(quick: bool) -> list[Measurement]:
+    iterations = 20_000 if quick else 200_000
+    config = FIGHTING_CONFIGS["default"]
+    cpus = os.cpu_count() or 1
+    worker_counts = sorted({1, *(2 ** i for i in range(1, cpus.bit_length()) if 2 ** i < cpus), cpus})
+    measurements = []
+    for workers in worker_counts:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Warm the workers up so pool startup is not part of the measurement
+            warm_up = [Chunk(index=index, start=index, size=1, seed=0) for index in range(workers)]
+            list(run_chunks(executor, simulate_battles, config, warm_up, summarize=True))
+            chunks = plan_chunks(iterations, 0)
+            seconds = _best_time(
+                lambda: list(run_chunks(executor, simulate_battles, config, chunks, summarize=True)), 1
+            )
+        measurements.append(
+            Measurement(f"pool/simulate_battles/{workers}_workers", iterations / seconds, "runs/s", True)
+        )
+    return measurements
+
+
+def stats_cases(quick: bool) -> list[Measurement]:
+    rng = np.random.default_rng(0)
+    measurements = []
+    for size in (10_000, 1_000_000):
+        fighting = FightingSimBatch(time=rng.gamma(4, 40, size), enemy_killed=rng.poisson(6, size))
+        thieving = ThievingSimBatch(
+            time=rng.gamma(4, 20, size),
+            money_earned=rng.poisson(9000, size),
+            success_thieving_count=rng.poisson(14, size),
+            failed_thieving_count=rng.poisson(10, size),
+            thieving_count=rng.poisson(24, size),
+        )
+        for name, batch, formatter in (
+                ("fighting", fighting, format_fighting_results),
+                ("thieving", thieving, format_thieve_results),
+        ):
+            seconds = _best_time(lambda: BatchStats.from_batch(batch), 1 if quick else 3)
+            measurements.append(Measurement(f"stats/accumulate/{name}/{size}", seconds, "s", False))
+            stats = BatchStats.from_batch(batch)
+            seconds = _best_time(lambda: formatter(stats), 3)
+            measurements.append(Measurement(f"stats/format/{name}/{size}", seconds, "s", False))
+    return measurements
+
+
+def agreement_cases(quick: bool) -> list[Measurement]:
+    """Distance, in standard errors, of each engine's mean fight time from solve_battle at equal intervals.
+
+    Every engine runs the fight of simulate_battle then, so values beyond about
+    3 point at an engine drifting from it. Seeded, so a run repeats exactly.
+    """
+    n = 20_000 if quick else 100_000
+    config = FIGHTING_CONFIGS["default"]
+    config = config._replace(enemy_attack_interval=config.player_attack_interval)
+    exact = solve_battle(config).time.mean
+    measurements = []
+    for engine, batch_fn in FIGHTING_ENGINES.items():
+        time = batch_fn(config, n, SimulationStreams(0)).time
+        z = abs(time.mean() - exact) / np.sqrt(time.var() / n)
+        measurements.append(Measurement(f"agreement/fight_time/{engine}", z, "sigma", False))
+    return measurements
+
+
+SUITES = {
+    "latency": latency_cases,
+    "throughput": throughput_cases,
+    "pool": pool_scaling_cases,
+    "stats": stats_cases,
+    "agreement": agreement_cases,
+}
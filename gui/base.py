@@ -1,17 +1,57 @@
 import json
+import multiprocessing
 import os
+import queue
+import time
 import tkinter as tk
-from contextlib import suppress
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+from contextlib import nullcontext, suppress
+from threading import Thread
 from tkinter import ttk, filedialog, messagebox
+from typing import Callable, NamedTuple
+
+from sims import cancellation, instrumentation
+from sims.buffers import SharedResultBuffer, archive_percentiles, record_dtype
+from sims.cache import ResultCache
+from sims.client import ServiceClient
+from sims.compare import format_comparison, run_comparison
+from sims.kinds import KINDS
+from sims.optimize import METRICS, format_seek_result, seek_threshold
+from sims.runner import default_workers, merge_in_order, plan_chunks, run_chunks, run_until_precision
+from sims.stats import BatchStats
+from sims.sweep import format_sweep_table, run_sweep, sweep_grid, value_range
+
+
+# Worker threads post updates to the Tk thread, which draws the latest of each at this period
+FRAME_INTERVAL_MS = 50
+
+
+class RunSettings(NamedTuple):
+    """The form as it was when Start was pressed, read on the Tk thread."""
+    config: tuple
+    iterations: int
+    seed: int | None
+    target_error: float
+    engine: str
+    batch_engine: Callable | None  # None when an exact solver is selected
+    solver: Callable | None
+    instrument: bool
+    archive: bool
 
 
 class BaseTkView:
     TITLE: str = "Simulation GUI"
+    # Name of the simulation in sims.kinds.KINDS, for jobs sent to the local service
+    KIND: str = ""
     DEFAULTS: dict[str, str] = {}
+    # Fields rendered as a drop-down list instead of a free text entry
+    CHOICES: dict[str, list[str]] = {}
+    # Result columns whose means must reach "Target Error %" in precision mode
+    PRECISION_FIELDS: tuple[str, ...] = ()
     DEFAULTEXTENSION = 'json'
 
     def __init__(self, root):
-        self.entries: dict[str, tk.Entry] = {}
+        self.entries: dict[str, ttk.Entry] = {}
         self.load_defaults()
         self.root = root
         self.root.title(self.TITLE)
@@ -29,18 +69,310 @@ class BaseTkView:
         # Input fields and result display
         self.setup_input_fields()
 
+        rows = len(self.DEFAULTS)
         self.result_text = tk.Text(self.main_frame, width=40, height=10)
-        self.result_text.grid(column=2, row=0, rowspan=13, padx=10, sticky=(tk.N, tk.S, tk.E, tk.W))
+        self.result_text.grid(column=2, row=0, rowspan=rows, padx=10, sticky=(tk.N, tk.S, tk.E, tk.W))
 
         self.progress = ttk.Progressbar(self.main_frame, orient='horizontal', length=200, mode='determinate')
-        self.progress.grid(column=0, row=13, columnspan=3, sticky=(tk.W, tk.E), pady=10)
+        self.progress.grid(column=0, row=rows, columnspan=3, sticky=(tk.W, tk.E), pady=10)
 
         self.start_button = ttk.Button(self.main_frame, text="Start Simulation", command=self.start_simulation_thread)
-        self.start_button.grid(column=0, row=14, columnspan=3, sticky=(tk.W, tk.E))
+        self.start_button.grid(column=0, row=rows + 1, columnspan=3, sticky=(tk.W, tk.E))
+
+        # Throughput of the last run: sims/sec, worker utilization and phase timings
+        self.status_label = ttk.Label(self.main_frame, text="", justify=tk.LEFT)
+        self.status_label.grid(column=0, row=rows + 2, columnspan=3, sticky=(tk.W, tk.E), pady=(5, 0))
+        self.instrument = tk.BooleanVar(value=False)
+        self.archive_results = tk.BooleanVar(value=False)
         self.running = False
         self.thread = None
+        # Warm pool reused by every run, created on the first one; Stop sets the event its workers check
+        self.executor: ProcessPoolExecutor | None = None
+        self.cancel_event = multiprocessing.Event()
+        self.pending_updates: queue.SimpleQueue = queue.SimpleQueue()
+        # Monitor of the pool run in progress, which also times the drawing of its updates
+        self.monitor: instrumentation.RunMonitor | None = None
+        self.cache = ResultCache()
         root.protocol("WM_DELETE_WINDOW", self.destroy_root(root))
         self.create_menu(root)
+        self.draw_updates()
+
+    def build_sim_config(self) -> tuple:
+        raise NotImplementedError
+
+    def get_batch_engine(self) -> Callable:
+        raise NotImplementedError
+
+    def get_solver(self) -> Callable | None:
+        """Exact solver ``(config, count) -> BatchStats`` to use instead of sampling, if selected."""
+        return None
+
+    def update_result_display(self, results: BatchStats):
+        raise NotImplementedError
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=default_workers(), initializer=cancellation.install, initargs=(self.cancel_event,)
+            )
+        return self.executor
+
+    def read_settings(self, sampling: bool = False) -> RunSettings:
+        """The form as settings of a run; ``sampling`` tools get a batch engine even when a solver is selected."""
+        target_error = self.get_target_error()
+        solver = None if sampling else self.get_solver()
+        return RunSettings(
+            config=self.build_sim_config(),
+            iterations=int(self.entries["Iterations"].get()),
+            seed=self.get_seed(),
+            target_error=target_error,
+            engine=self.entries["Engine"].get(),
+            batch_engine=None if solver else self.get_batch_engine(),
+            solver=solver,
+            instrument=self.instrument.get(),
+            archive=self.archive_results.get(),
+        )
+
+    def read_settings_or_warn(self, sampling: bool = False) -> RunSettings | None:
+        try:
+            return self.read_settings(sampling)
+        except ValueError as e:
+            messagebox.showerror("Ошибка", f"Неверные параметры: {e}")
+            return None
+
+    def start_run(self, target: Callable, *args) -> bool:
+        """Run ``target(*args)`` on a worker thread as the current run, the one Stop cancels."""
+        # A stopped run is still waiting for its chunks to leave the pool
+        if self.running or (self.thread and self.thread.is_alive()):
+            self.show_status("Another run is in progress, stop it first")
+            return False
+        self.cancel_event.clear()
+        self.running = True
+        self.thread = Thread(target=target, args=args)
+        self.thread.start()
+        self.start_button.config(text="Stop Simulation")
+        return True
+
+    def run_tool(self, tool: Callable, *args):
+        """Body of a run on the warm pool: Stop ends it, a failure is shown and the button comes back either way."""
+        try:
+            tool(*args)
+        except cancellation.Cancelled:
+            pass
+        except Exception as e:
+            if isinstance(e, BrokenExecutor) and self.executor:
+                # A worker died and the pool takes no more work: the next run starts a new one
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
+            self.post("error", messagebox.showerror, "Ошибка", f"Запуск прерван: {e!r}")
+        finally:
+            self.running = False
+            self.post("button", self.finish_run)
+
+    def start_simulation_thread(self):
+        if not self.running:
+            settings = self.read_settings_or_warn()
+            if settings is None:
+                return
+            self.progress['maximum'] = settings.iterations
+            self.progress['value'] = 0
+            self.start_run(self.run_tool, self.start_simulation, settings)
+        else:
+            self.cancel_event.set()
+            self.progress['value'] = 0
+            self.running = False
+            self.start_button.config(text="Start Simulation")
+
+    def post(self, key: str, callback: Callable, *args):
+        """Have the Tk thread call ``callback(*args)`` on its next frame.
+
+        Worker threads never touch widgets themselves. Of the updates posted
+        with one ``key`` between two frames only the last is drawn.
+        """
+        self.pending_updates.put((key, callback, args))
+
+    def draw_updates(self):
+        try:
+            latest = {}
+            # Only what was queued before this frame, so a fast producer cannot keep the Tk thread here
+            for _ in range(self.pending_updates.qsize()):
+                key, callback, args = self.pending_updates.get_nowait()
+                latest[key] = callback, args
+            monitor = self.monitor
+            with monitor.phase("gui") if monitor else nullcontext():
+                for callback, args in latest.values():
+                    callback(*args)
+        finally:
+            # A failing update must not end the drawing of every later one
+            self.root.after(FRAME_INTERVAL_MS, self.draw_updates)
+
+    def show_stats(self, stats: BatchStats, precision: dict[str, float] | None = None):
+        self.update_result_display(stats)
+        if precision is not None:
+            self.show_precision(precision)
+
+    def show_progress(self, count: int):
+        self.progress['value'] = count
+
+    def show_status(self, text: str):
+        self.status_label.config(text=text)
+
+    def finish_run(self):
+        self.start_button.config(text="Start Simulation")
+
+    def show_precision(self, precision: dict[str, float]):
+        lines = (f"{field}: ±{value * 100:.2f}%" for field, value in precision.items())
+        self.result_text.insert(tk.END, "\n" + "-" * 20 + "\nPrecision (95% CI):\n" + "\n".join(lines))
+
+    def get_seed(self) -> int | None:
+        """Seed of the run; an empty field means fresh entropy and no result caching."""
+        value = self.entries["Seed"].get().strip()
+        return int(value) if value else None
+
+    def get_target_error(self) -> float:
+        return float(self.entries["Target Error %"].get() or 0) / 100
+
+    def iterate_stats(
+            self,
+            executor,
+            settings: RunSettings,
+            max_workers: int,
+            buffer: SharedResultBuffer | None = None,
+            monitor: instrumentation.RunMonitor | None = None,
+    ):
+        """Yield ``(stats, precision, chunk_result)`` after each finished chunk.
+
+        Precision is None in fixed mode. Merging is timed by ``monitor``.
+        """
+        batch_engine, config, iterations, seed = (
+            settings.batch_engine, settings.config, settings.iterations, settings.seed
+        )
+        spec = buffer.spec if buffer else None
+        if settings.target_error > 0:
+            # Iterations become the budget of the precision-target mode
+            progress_updates = run_until_precision(
+                executor, batch_engine, config, self.PRECISION_FIELDS, settings.target_error, iterations, max_workers,
+                seed, instrument=settings.instrument, buffer=spec, monitor=monitor,
+            )
+            try:
+                for progress in progress_updates:
+                    yield progress.stats, progress.precision, progress.chunk_result
+            finally:
+                progress_updates.close()
+            return
+
+        chunks = plan_chunks(iterations, seed)
+        chunk_results = run_chunks(
+            executor, batch_engine, config, chunks, summarize=True, instrument=settings.instrument, buffer=spec
+        )
+        try:
+            for stats, chunk_result in merge_in_order(chunk_results, monitor):
+                yield stats, None, chunk_result
+        finally:
+            chunk_results.close()
+
+    def start_simulation(self, settings: RunSettings):
+        config, iterations, seed = settings.config, settings.iterations, settings.seed
+        self.monitor = None
+        if settings.solver:
+            # On the pool, where Stop reaches the solver through the cancel event
+            stats = self.get_executor().submit(settings.solver, config, iterations).result()
+            if self.running:
+                self.post("result", self.show_stats, stats)
+                self.post("button", self.finish_run)
+                self.running = False
+            return
+
+        batch_engine = settings.batch_engine
+        max_workers = default_workers()
+        # Only fixed-size runs are cached: a precision run has no fixed size to look up
+        use_cache = seed is not None and settings.target_error <= 0
+
+        if use_cache and (stats := self.cache.get(batch_engine, config, seed, iterations)):
+            self.post("result", self.show_stats, stats)
+            self.post("progress", self.show_progress, iterations)
+            self.post("button", self.finish_run)
+            self.running = False
+            return
+
+        # Share the machine through the local service when one runs; archives and counters need the local pool
+        client = None if settings.archive or settings.instrument else ServiceClient.connect()
+        if client:
+            with client:
+                stats = self.run_on_service(client, settings)
+            if self.running:
+                if use_cache and stats is not None:
+                    self.cache.put(batch_engine, config, seed, stats.count, stats)
+                self.post("button", self.finish_run)
+                self.running = False
+            return
+
+        stats = None
+        monitor = self.monitor = instrumentation.RunMonitor(max_workers)
+        # Per-simulation records land in shared memory and are archived once the run completes
+        buffer = None
+        if settings.archive:
+            buffer = SharedResultBuffer(record_dtype(batch_engine, config), iterations)
+        try:
+            # Каждый процесс получает крупный кусок итераций со своим генератором
+            updates = self.iterate_stats(self.get_executor(), settings, max_workers, buffer, monitor)
+            try:
+                while True:
+                    # Time spent blocked on the pool; merging the chunk statistics is "aggregation"
+                    with monitor.phase("wait"):
+                        update = next(updates, None)
+                    if update is None or not self.running:
+                        break
+                    stats, precision, chunk_result = update
+                    monitor.chunk_done(chunk_result)
+                    # The merge goes on in this thread while the Tk thread draws, so it gets a copy
+                    self.post("result", self.show_stats, stats.copy(), precision)
+                    self.post("progress", self.show_progress, stats.count)
+                    self.post("status", self.show_status, monitor.status())
+            except cancellation.Cancelled:
+                pass
+            finally:
+                # Returns once the chunks still in the pool have seen the event and ended
+                updates.close()
+
+            if self.running:
+                if use_cache and stats is not None:
+                    self.cache.put(batch_engine, config, seed, stats.count, stats)
+                if buffer and stats is not None:
+                    path = f"saves/archives/{self.__class__.__name__}-{time.strftime('%Y%m%d-%H%M%S')}.npy"
+                    buffer.save(path, stats.count)
+                    self.post("status", self.show_status, f"{monitor.status()}\nArchived to {path}")
+                self.post("button", self.finish_run)
+                self.running = False
+        finally:
+            # Closed even when the run fails, so no segment outlives it
+            if buffer:
+                buffer.close()
+
+    def run_on_service(self, client: ServiceClient, settings: RunSettings):
+        """Run the job on the local service; returns the final statistics unless stopped."""
+        started = time.perf_counter()
+        updates = client.run(
+            self.KIND, settings.config, settings.iterations, settings.seed, settings.engine,
+            target_error=settings.target_error,
+        )
+        cancelled = False
+        for update in updates:
+            if not self.running:
+                # Keep reading until the service confirms, so the connection closes cleanly
+                if not cancelled:
+                    client.cancel()
+                    cancelled = True
+                continue
+            if update.event == "cancelled":
+                return None
+            self.post("result", self.show_stats, update.stats, update.precision)
+            self.post("progress", self.show_progress, update.stats.count)
+            rate = update.stats.count / (time.perf_counter() - started)
+            self.post("status", self.show_status, f"{rate:,.0f} sims/s on the local service")
+            if update.event == "done":
+                return update.stats
+        return None
 
     def save_data(self):
         self.create_saves_dir()
@@ -75,8 +407,186 @@ class BaseTkView:
         file_menu.add_command(label="Сохранить", command=self.save_data)
         file_menu.add_command(label="Загрузить", command=self.load_data)
         menu_bar.add_cascade(label="Файл", menu=file_menu)
+        tools_menu = tk.Menu(menu_bar, tearoff=0)
+        tools_menu.add_command(label="Перебор параметров", command=self.open_sweep_panel)
+        tools_menu.add_command(label="Сравнение A/B", command=self.open_compare_panel)
+        tools_menu.add_command(label="Поиск порога", command=self.open_seek_panel)
+        tools_menu.add_checkbutton(label="Счётчики движка", variable=self.instrument)
+        tools_menu.add_checkbutton(label="Архивировать результаты", variable=self.archive_results)
+        tools_menu.add_command(label="Перцентили архива", command=self.show_archive_percentiles)
+        tools_menu.add_command(label="Профилировать движок", command=self.profile_engine_thread)
+        menu_bar.add_cascade(label="Инструменты", menu=tools_menu)
         window.config(menu=menu_bar)
 
+    def show_archive_percentiles(self):
+        file_name = filedialog.askopenfilename(
+            initialdir="./saves/archives/", filetypes=[("Archives", "*.npy"), ("All files", "*.*")]
+        )
+        if not file_name:
+            return
+        percentiles = [1, 5, 25, 50, 75, 95, 99]
+        lines = [os.path.basename(file_name)]
+        for field in self.PRECISION_FIELDS:
+            values = archive_percentiles(file_name, field, percentiles)
+            lines.append(f"{field}: " + ", ".join(f"p{p} {v:.1f}" for p, v in zip(percentiles, values)))
+        self.result_text.delete("1.0", tk.END)
+        self.result_text.insert(tk.END, "\n".join(lines))
+
+    def profile_engine_thread(self):
+        self.status_label.config(text="Profiling...")
+        if settings := self.read_settings_or_warn(sampling=True):
+            Thread(target=self.profile_engine, args=(settings,), daemon=True).start()
+
+    def profile_engine(self, settings: RunSettings):
+        """Run the selected engine in-process under cProfile and dump the stats next to the saves."""
+        self.create_saves_dir()
+        dump_path = f"saves/{self.__class__.__name__}.prof"
+        instrumentation.profiled(
+            settings.batch_engine, settings.config, settings.iterations, dump_path=dump_path, print_top=25
+        )
+        self.post("status", self.show_status, f"Profile written to {dump_path}")
+
+    def show_text(self, text_widget: tk.Text, text: str):
+        text_widget.delete("1.0", tk.END)
+        text_widget.insert(tk.END, text)
+
+    def open_sweep_panel(self):
+        config = self.build_sim_config()
+        panel = tk.Toplevel(self.root)
+        panel.title("Перебор параметров")
+        frame = ttk.Frame(panel, padding="10 10 10 10")
+        frame.grid(column=0, row=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        help_text = "One range per line: field start stop step\nFields: " + ", ".join(config._fields)
+        ttk.Label(frame, text=help_text, wraplength=500).grid(column=0, row=0, sticky=tk.W)
+        ranges_text = tk.Text(frame, width=60, height=4)
+        ranges_text.grid(column=0, row=1, sticky=(tk.W, tk.E), pady=5)
+        table_text = tk.Text(frame, width=80, height=20)
+        table_text.grid(column=0, row=3, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        def run():
+            settings = self.read_settings_or_warn(sampling=True)
+            if settings is None:
+                return
+            ranges = {}
+            try:
+                for line in ranges_text.get("1.0", tk.END).splitlines():
+                    if line.strip():
+                        field, start, stop, step = line.split()
+                        ranges[field] = value_range(start, stop, step)
+                # Every grid point is checked before the pool gets any of them
+                sweep_grid(settings.config, ranges, KINDS[self.KIND].config_from_save)
+            except (ValueError, ArithmeticError) as e:
+                messagebox.showerror("Ошибка", f"Неверные параметры: {e}")
+                return
+            self.start_run(self.run_tool, self.run_sweep, settings, ranges, table_text)
+
+        ttk.Button(frame, text="Run Sweep", command=run).grid(column=0, row=2, sticky=(tk.W, tk.E))
+
+    def run_sweep(self, settings: RunSettings, ranges: dict[str, list], table_text: tk.Text):
+        points = []
+        sweep = run_sweep(
+            self.get_executor(), settings.batch_engine, settings.config, ranges, KINDS[self.KIND].config_from_save,
+            settings.iterations, settings.seed,
+        )
+        for point in sweep:
+            points.append(point)
+            table = format_sweep_table(points, self.PRECISION_FIELDS)
+            self.post(str(table_text), self.show_text, table_text, table)
+
+    def open_compare_panel(self):
+        config = self.build_sim_config()
+        panel = tk.Toplevel(self.root)
+        panel.title("Сравнение A/B")
+        frame = ttk.Frame(panel, padding="10 10 10 10")
+        frame.grid(column=0, row=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        help_text = (
+            "A is the current setup. B overrides, one per line: field value\nFields: " + ", ".join(config._fields)
+        )
+        ttk.Label(frame, text=help_text, wraplength=500).grid(column=0, row=0, sticky=tk.W)
+        overrides_text = tk.Text(frame, width=60, height=4)
+        overrides_text.grid(column=0, row=1, sticky=(tk.W, tk.E), pady=5)
+        antithetic = tk.BooleanVar(value=False)
+        ttk.Checkbutton(frame, text="Antithetic variates", variable=antithetic).grid(column=0, row=2, sticky=tk.W)
+        comparison_text = tk.Text(frame, width=80, height=12)
+        comparison_text.grid(column=0, row=4, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        def run():
+            settings = self.read_settings_or_warn(sampling=True)
+            if settings is None:
+                return
+            overrides = {}
+            try:
+                for line in overrides_text.get("1.0", tk.END).splitlines():
+                    if line.strip():
+                        field, value = line.split()
+                        overrides[field] = [value]
+                [(_, config_b)] = sweep_grid(settings.config, overrides, KINDS[self.KIND].config_from_save)
+            except ValueError as e:
+                messagebox.showerror("Ошибка", f"Неверные параметры: {e}")
+                return
+            self.start_run(self.run_tool, self.run_compare, settings, config_b, antithetic.get(), comparison_text)
+
+        ttk.Button(frame, text="Run Comparison", command=run).grid(column=0, row=3, sticky=(tk.W, tk.E))
+
+    def run_compare(self, settings: RunSettings, config_b: tuple, antithetic: bool, comparison_text: tk.Text):
+        pairs = run_comparison(
+            self.get_executor(), settings.batch_engine, settings.config, config_b, settings.iterations, settings.seed,
+            antithetic,
+        )
+        for paired in pairs:
+            comparison = format_comparison(paired, self.PRECISION_FIELDS)
+            self.post(str(comparison_text), self.show_text, comparison_text, comparison)
+
+    def open_seek_panel(self):
+        config = self.build_sim_config()
+        metrics = METRICS[self.KIND]
+        panel = tk.Toplevel(self.root)
+        panel.title("Поиск порога")
+        frame = ttk.Frame(panel, padding="10 10 10 10")
+        frame.grid(column=0, row=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        inputs = {
+            "Field": ttk.Combobox(frame, values=list(config._fields), state="readonly"),
+            "Low": ttk.Entry(frame),
+            "High": ttk.Entry(frame),
+            "Goal": ttk.Combobox(frame, values=list(metrics), state="readonly"),
+            "Target": ttk.Entry(frame),
+        }
+        inputs["Field"].set(config._fields[0])
+        inputs["Goal"].set(next(iter(metrics)))
+        inputs["Target"].insert(0, "0.95")
+        for row, (label, widget) in enumerate(inputs.items()):
+            ttk.Label(frame, text=f"{label}:").grid(column=0, row=row, sticky=tk.W, pady=2)
+            widget.grid(column=1, row=row, sticky=(tk.W, tk.E), pady=2)
+        result_text = tk.Text(frame, width=80, height=16)
+        result_text.grid(column=0, row=len(inputs) + 1, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        def run():
+            values = {label: widget.get() for label, widget in inputs.items()}
+            settings = self.read_settings_or_warn(sampling=True)
+            if settings and self.start_run(self.run_tool, self.run_seek, settings, values, result_text):
+                self.show_text(result_text, "Searching...")
+
+        ttk.Button(frame, text="Run Search", command=run).grid(
+            column=0, row=len(inputs), columnspan=2, sticky=(tk.W, tk.E)
+        )
+
+    def run_seek(self, settings: RunSettings, values: dict[str, str], result_text: tk.Text):
+        try:
+            result = seek_threshold(
+                self.get_executor(), settings.batch_engine, settings.config, KINDS[self.KIND].config_from_save,
+                values["Field"], values["Low"], values["High"], METRICS[self.KIND][values["Goal"]],
+                float(values["Target"]), default_workers(), settings.seed,
+            )
+            text = format_seek_result(result, values["Goal"], float(values["Target"]))
+        except ValueError as e:
+            text = str(e)
+        except cancellation.Cancelled:
+            text = "Stopped"
+        self.post(str(result_text), self.show_text, result_text, text)
+
     def update_defaults(self):
         for key, value in self.DEFAULTS.items():
             self.DEFAULTS[key] = self.entries[key].get()
@@ -84,6 +594,9 @@ class BaseTkView:
     def update_entries(self):
         for key, value in self.DEFAULTS.items():
             if entry := self.entries.get(key):
+                if isinstance(entry, ttk.Combobox):
+                    entry.set(self.DEFAULTS[key])
+                    continue
                 entry.delete(0, tk.END)
                 entry.insert(0, self.DEFAULTS[key])
 
@@ -110,16 +623,23 @@ class BaseTkView:
     def destroy_root(self, root):
         def destroy_fn():
             self.save_defaults()
+            if self.executor:
+                self.cancel_event.set()
+                self.executor.shutdown(cancel_futures=True)
             root.destroy()
 
         return destroy_fn
 
     def setup_input_fields(self):
-        for idx, (label, value) in enumerate(self.DEFAULTS.items()):
-            label = ttk.Label(self.main_frame, text=f"{label}:")
+        for idx, (name, value) in enumerate(self.DEFAULTS.items()):
+            label = ttk.Label(self.main_frame, text=f"{name}:")
             label.grid(column=0, row=idx, sticky=tk.W, pady=2)
 
-            entry = ttk.Entry(self.main_frame, width=7)
+            if name in self.CHOICES:
+                entry = ttk.Combobox(self.main_frame, width=7, values=self.CHOICES[name], state="readonly")
+                entry.set(value)
+            else:
+                entry = ttk.Entry(self.main_frame, width=7)
+                entry.insert(0, value)
             entry.grid(column=1, row=idx, sticky=(tk.W, tk.E), pady=2)
-            entry.insert(0, value)
-            self.entries[label.cget("text")[:-1]] = entry
+            self.entries[name] = entry
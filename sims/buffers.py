@@ -0,0 +1,103 @@
+"""Columnar result records: shared-memory buffers and memory-mapped ``.npy`` archives.
+
+A run keeps one structured record per simulation, indexed by simulation
+index. Workers write their chunk straight into a buffer in shared memory, so
+per-simulation results never travel through pickling; a finished buffer can
+be saved as an ``.npy`` archive and queried later through a memory map.
+"""
+import os
+from multiprocessing import shared_memory
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+from sims.rng import SimulationStreams
+from sims.stats import BatchStats
+
+# Records streamed through the statistics at once when summarizing an archive
+ARCHIVE_BLOCK_SIZE = 1_000_000
+
+
+def record_dtype(batch_fn: Callable, config: tuple) -> np.dtype:
+    """Structured dtype with one field per column of the batches ``batch_fn`` returns."""
+    empty = batch_fn(config, 0, SimulationStreams(0))
+    return np.dtype([(field, column.dtype) for field, column in zip(empty._fields, empty)])
+
+
+def write_batch(records: np.ndarray, start: int, batch: tuple):
+    for field, column in zip(batch._fields, batch):
+        records[field][start:start + len(column)] = column
+
+
+class BufferSpec(NamedTuple):
+    """What a worker needs to attach to a SharedResultBuffer."""
+    name: str
+    dtype: np.dtype
+    size: int
+
+
+# Worker-side attachment to the buffer of the current run, reused by all its chunks
+_attached: dict[str, tuple[shared_memory.SharedMemory, np.ndarray]] = {}
+
+
+def attach(spec: BufferSpec) -> np.ndarray:
+    if spec.name not in _attached:
+        # A warm worker outlives its runs: the buffers of the earlier ones are no longer written
+        detach_all()
+        memory = shared_memory.SharedMemory(name=spec.name)
+        _attached[spec.name] = memory, np.ndarray(spec.size, dtype=spec.dtype, buffer=memory.buf)
+    return _attached[spec.name][1]
+
+
+def detach_all():
+    while _attached:
+        _, (memory, records) = _attached.popitem()
+        del records
+        memory.close()
+
+
+class SharedResultBuffer:
+    """Preallocated records of ``size`` simulations in shared memory, owned by the parent process."""
+
+    def __init__(self, dtype: np.dtype, size: int):
+        self._memory = shared_memory.SharedMemory(create=True, size=max(dtype.itemsize * size, 1))
+        self.records = np.ndarray(size, dtype=dtype, buffer=self._memory.buf)
+        self.spec = BufferSpec(name=self._memory.name, dtype=dtype, size=size)
+
+    def save(self, path: str, count: int | None = None):
+        """Write the first ``count`` records (all by default) as an ``.npy`` archive."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.save(path, self.records[:count])
+
+    def close(self):
+        del self.records
+        self._memory.close()
+        self._memory.unlink()
+
+    def __enter__(self) -> "SharedResultBuffer":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_archive(path: str) -> np.ndarray:
+    """Records of an archive, memory-mapped read-only: nothing is read until it is used."""
+    return np.load(path, mmap_mode="r")
+
+
+def archive_percentiles(path: str, field: str, percentiles: list[float]) -> list[float]:
+    """Exact percentiles of one field; only that column is read into memory."""
+    column = np.array(load_archive(path)[field])
+    return np.percentile(column, percentiles).tolist()
+
+
+def archive_stats(path: str, block_size: int = ARCHIVE_BLOCK_SIZE) -> BatchStats:
+    """Streaming statistics of every field, reading at most ``block_size`` records at a time."""
+    records = load_archive(path)
+    stats = BatchStats(records.dtype.names)
+    for start in range(0, len(records), block_size):
+        block = records[start:start + block_size]
+        for field in records.dtype.names:
+            stats.columns[field].add_many(block[field])
+    return stats
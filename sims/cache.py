@@ -0,0 +1,81 @@
+import functools
+import hashlib
+import os
+import pickle
+from typing import Callable
+
+from sims.stats import BatchStats
+
+CACHE_DIR = "saves/cache"
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Bump whenever an engine change alters the results produced for a given seed
+ENGINE_VERSION = 5
+
+
+def engine_name(engine: Callable) -> str:
+    if isinstance(engine, functools.partial):
+        args = ", ".join(engine_name(arg) if callable(arg) else repr(arg) for arg in engine.args)
+        return f"{engine_name(engine.func)}({args})"
+    return f"{engine.__module__}.{engine.__qualname__}"
+
+
+class ResultCache:
+    """Content-addressed store of accumulated statistics with size-bounded LRU eviction.
+
+    Entries are keyed by engine, engine version, config and seed; each file also
+    records the iteration count so a lookup can reuse any run at least as large.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key(self, engine: Callable, config: tuple, seed: int) -> str:
+        identity = f"{engine_name(engine)}|{ENGINE_VERSION}|{config!r}|{seed}"
+        return hashlib.sha256(identity.encode()).hexdigest()
+
+    def get(self, engine: Callable, config: tuple, seed: int, iterations: int) -> BatchStats | None:
+        """Smallest cached run of at least ``iterations``, if any."""
+        key = self.key(engine, config, seed)
+        candidates = sorted((size, name) for name, size in self._entries(key) if size >= iterations)
+        for _, name in candidates:
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, "rb") as cache_file:
+                    stats = pickle.load(cache_file)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                continue
+            os.utime(path)  # mark as recently used
+            return stats
+        return None
+
+    def put(self, engine: Callable, config: tuple, seed: int, iterations: int, stats: BatchStats):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{self.key(engine, config, seed)}-{iterations}.pkl")
+        with open(f"{path}.tmp", "wb") as cache_file:
+            pickle.dump(stats, cache_file)
+        os.replace(f"{path}.tmp", path)
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in ``max_bytes``."""
+        with os.scandir(self.directory) as entries:
+            files = [
+                (entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                for entry in entries if entry.name.endswith(".pkl")
+            ]
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def _entries(self, key: str) -> list[tuple[str, int]]:
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.startswith(f"{key}-") and name.endswith(".pkl"):
+                entries.append((name, int(name[len(key) + 1:-len(".pkl")])))
+        return entries
@@ -0,0 +1,24 @@
+"""Cooperative cancellation of the chunks running in pool workers.
+
+A pool created with ``initializer=install, initargs=(event,)`` shares one
+``multiprocessing.Event`` with its workers. Engines call ``check()`` once per
+lockstep iteration (scalar engines once per run), which raises ``Cancelled``
+as soon as the event is set, so a stopped run frees the cores within
+milliseconds instead of finishing its chunks. Outside such a pool ``check()``
+is a single ``is None`` test.
+"""
+_event = None
+
+
+class Cancelled(Exception):
+    pass
+
+
+def install(event):
+    global _event
+    _event = event
+
+
+def check():
+    if _event is not None and _event.is_set():
+        raise Cancelled
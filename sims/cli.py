@@ -0,0 +1,349 @@
+"""Headless batch runner: ``python -m sims fight|thieve jobs.jsonl [...]``.
+
+Every input line is one JSON config, either with the config field names or
+with the GUI labels of a ``.fsave`` / ``.thsave`` file (those files are one
+line of JSON, so they can be passed directly). Per-job "Iterations", "Seed"
+and "Engine" keys override the command line defaults. One JSON line is
+written per job as soon as it finishes.
+
+``python -m sims compare fight a.fsave b.fsave`` runs two configs paired on
+the same random streams and prints the difference of their means.
+
+``python -m sims seek fight base.fsave player_hit_chance 0.5 1 --goal cap --target 0.95``
+searches the hit chance at which 95% of the fights last to the cap.
+
+``--archive DIR`` keeps every simulation of job N in ``DIR/job-N.npy`` and
+``python -m sims percentiles DIR/job-N.npy`` queries such an archive.
+
+``python -m sims serve`` starts the local service that GUIs and scripts share.
+
+``python -m sims worker --port 8800`` starts a cluster node on a machine;
+``--nodes host:8800,other:8800`` then shards every job over those nodes.
+
+``--instrument`` adds the engine counters per run to every output line,
+``--profile out.prof`` runs the jobs in-process under cProfile instead of in
+the pool and dumps the profile.
+"""
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+from typing import Callable, Iterator, NamedTuple
+
+import numpy as np
+
+from sims import cluster, instrumentation, service
+from sims.buffers import archive_percentiles, load_archive, record_dtype, write_batch
+from sims.compare import compare_fields, run_comparison
+from sims.kinds import KINDS
+from sims.optimize import METRICS, seek_threshold
+from sims.runner import default_workers, plan_chunks, run_chunk
+from sims.stats import BatchStats
+
+# Jobs submitted ahead per worker; bounds memory however long the job files are
+JOBS_PER_WORKER = 2
+
+
+class Job(NamedTuple):
+    index: int
+    source: str
+    line: str
+
+
+def read_jobs(paths: list[str]) -> Iterator[Job]:
+    index = 0
+    for path in paths:
+        with (sys.stdin if path == "-" else open(path)) as jobs_file:
+            for line_number, line in enumerate(jobs_file, start=1):
+                if line.strip():
+                    yield Job(index=index, source=f"{path}:{line_number}", line=line)
+                    index += 1
+
+
+def run_job(
+        kind: str,
+        line: str,
+        iterations: int,
+        seed: int | None,
+        engine: str,
+        instrument: bool = False,
+        archive: str | None = None,
+        nodes: list[str] | None = None,
+) -> dict:
+    config_from_save, engines, solver, _ = KINDS[kind]
+    values = json.loads(line)
+    config = config_from_save(values)
+    iterations = int(values.get("Iterations", values.get("iterations", iterations)))
+    seed = values.get("Seed", values.get("seed", seed))
+    seed = int(seed) if seed not in (None, "") else None
+    engine = values.get("Engine", values.get("engine", engine))
+
+    counters = Counter()
+    if engine == "analytic":
+        stats = solver(config, iterations)
+    elif nodes:
+        stats = cluster.run_on_nodes(nodes, kind, config, iterations, seed, engine)
+    else:
+        # Chunks run one after the other so a huge job never holds all its results at once
+        stats = None
+        records = None
+        if archive:
+            # The archive is filled through its memory map, chunk by chunk
+            dtype = record_dtype(engines[engine], config)
+            records = np.lib.format.open_memmap(archive, mode="w+", dtype=dtype, shape=(iterations,))
+        for chunk in plan_chunks(iterations, seed):
+            chunk_result = run_chunk(engines[engine], config, chunk, instrument=instrument)
+            if records is not None:
+                write_batch(records, chunk.start, chunk_result.result)
+            result = BatchStats.from_batch(chunk_result.result)
+            stats = stats.merge(result) if stats else result
+            counters.update(chunk_result.counters or {})
+        if records is not None:
+            records.flush()
+    output = {
+        "config": config._asdict(),
+        "engine": engine,
+        "iterations": iterations,
+        "seed": seed,
+        "count": stats.count,
+        "summary": stats.summary(),
+    }
+    if archive and engine != "analytic":
+        output["archive"] = archive
+    if instrument:
+        output["counters_per_run"] = {name: value / stats.count for name, value in counters.items()}
+    return output
+
+
+def format_job_output(job: Job, run: Callable[[], dict]) -> str:
+    line = {"job": job.index, "source": job.source}
+    try:
+        line.update(run())
+    except Exception as e:
+        line["error"] = f"{type(e).__name__}: {e}"
+    return json.dumps(line, default=str)
+
+
+def archive_path(directory: str | None, job: Job) -> str | None:
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"job-{job.index}.npy")
+
+
+def run_jobs_inline(
+        kind: str,
+        paths: list[str],
+        iterations: int,
+        seed: int | None,
+        engine: str,
+        instrument: bool,
+        archive: str | None = None,
+):
+    """Run the jobs one by one in this process, so that a profiler sees the engines."""
+    for job in read_jobs(paths):
+        run = partial(run_job, kind, job.line, iterations, seed, engine, instrument, archive_path(archive, job))
+        print(format_job_output(job, run), flush=True)
+
+
+def run_jobs_on_nodes(kind: str, paths: list[str], iterations: int, seed: int | None, engine: str, nodes: list[str]):
+    """Run the jobs one by one, each sharded over every node."""
+    for job in read_jobs(paths):
+        run = partial(run_job, kind, job.line, iterations, seed, engine, nodes=nodes)
+        print(format_job_output(job, run), flush=True)
+
+
+def run_jobs(
+        kind: str,
+        paths: list[str],
+        iterations: int,
+        seed: int | None,
+        engine: str,
+        workers: int,
+        instrument: bool = False,
+        archive: str | None = None,
+):
+    jobs = read_jobs(paths)
+    pending = {}
+    exhausted = False
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while pending or not exhausted:
+            while not exhausted and len(pending) < workers * JOBS_PER_WORKER:
+                job = next(jobs, None)
+                if job is None:
+                    exhausted = True
+                    break
+                job_archive = archive_path(archive, job)
+                future = executor.submit(run_job, kind, job.line, iterations, seed, engine, instrument, job_archive)
+                pending[future] = job
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                print(format_job_output(pending.pop(future), future.result), flush=True)
+
+
+def run_compare(
+        kind: str,
+        path_a: str,
+        path_b: str,
+        iterations: int,
+        seed: int | None,
+        engine: str,
+        workers: int,
+        antithetic: bool,
+):
+    config_from_save, engines, _, _ = KINDS[kind]
+    configs = []
+    for path in (path_a, path_b):
+        with open(path) as config_file:
+            configs.append(config_from_save(json.load(config_file)))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        *_, paired = run_comparison(executor, engines[engine], *configs, iterations, seed, antithetic)
+    line = {
+        "a": configs[0]._asdict(),
+        "b": configs[1]._asdict(),
+        "count": paired.count,
+        "antithetic": antithetic,
+        "fields": {
+            comparison.field: comparison._asdict()
+            for comparison in compare_fields(paired, paired.difference.fields)
+        },
+    }
+    print(json.dumps(line, default=str), flush=True)
+
+
+def run_seek(
+        kind: str,
+        path: str,
+        field: str,
+        low: str,
+        high: str,
+        goal: str,
+        target: float,
+        tolerance: float | None,
+        seed: int | None,
+        engine: str,
+        workers: int,
+        confidence: float,
+):
+    config_from_save, engines, _, _ = KINDS[kind]
+    with open(path) as config_file:
+        config = config_from_save(json.load(config_file))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        result = seek_threshold(
+            executor, engines[engine], config, config_from_save, field, low, high, METRICS[kind][goal], target,
+            workers, seed, confidence, tolerance,
+        )
+    line = {
+        "config": config._asdict(),
+        "goal": goal,
+        "target": target,
+        **result._asdict(),
+        "points": [point._asdict() for point in result.points],
+    }
+    print(json.dumps(line, default=str), flush=True)
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m sims", description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="kind", required=True)
+    for kind, (_, engines, _, _) in KINDS.items():
+        kind_parser = subparsers.add_parser(kind, help=f"run {kind} jobs")
+        kind_parser.add_argument("jobs", nargs="+", help="JSONL job files, .fsave/.thsave files, or - for stdin")
+        kind_parser.add_argument("--iterations", type=int, default=5000)
+        kind_parser.add_argument("--seed", type=int, default=None)
+        kind_parser.add_argument("--engine", choices=[*engines, "analytic"], default="batch")
+        kind_parser.add_argument("--workers", type=int, default=default_workers())
+        kind_parser.add_argument("--instrument", action="store_true", help="report engine counters per run")
+        kind_parser.add_argument("--profile", metavar="PATH", help="run in-process under cProfile, dump to PATH")
+        kind_parser.add_argument("--archive", metavar="DIR", help="keep every simulation in DIR/job-N.npy")
+        kind_parser.add_argument("--nodes", help="comma-separated host:port of cluster workers to shard jobs over")
+    compare_parser = subparsers.add_parser("compare", help="compare two configs on paired random streams")
+    compare_parser.add_argument("compare_kind", choices=list(KINDS))
+    compare_parser.add_argument("config_a", help="JSON config or save file of A")
+    compare_parser.add_argument("config_b", help="JSON config or save file of B")
+    compare_parser.add_argument("--iterations", type=int, default=5000)
+    compare_parser.add_argument("--seed", type=int, default=None)
+    compare_parser.add_argument("--engine", default="batch")
+    compare_parser.add_argument("--workers", type=int, default=default_workers())
+    compare_parser.add_argument("--antithetic", action="store_true", help="also run every index on mirrored draws")
+    seek_parser = subparsers.add_parser("seek", help="search the value of a field at which a goal is just met")
+    seek_parser.add_argument("seek_kind", choices=list(KINDS))
+    seek_parser.add_argument("config", help="JSON config or save file")
+    seek_parser.add_argument("field", help="config field to search, in config units (hit chances are 0..1)")
+    seek_parser.add_argument("low")
+    seek_parser.add_argument("high")
+    seek_parser.add_argument("--goal", required=True, help="fight: cap, kills_per_hour; thieve: cap, gold_per_hour")
+    seek_parser.add_argument("--target", type=float, required=True, help="mean the goal metric must reach")
+    seek_parser.add_argument("--tolerance", type=float, default=None, help="width of the final bracket")
+    seek_parser.add_argument("--confidence", type=float, default=0.95)
+    seek_parser.add_argument("--seed", type=int, default=None)
+    seek_parser.add_argument("--engine", default="batch")
+    seek_parser.add_argument("--workers", type=int, default=default_workers())
+    percentiles_parser = subparsers.add_parser("percentiles", help="query percentiles of a .npy result archive")
+    percentiles_parser.add_argument("archive")
+    percentiles_parser.add_argument("--field", action="append", help="field to query, every field by default")
+    percentiles_parser.add_argument("-q", type=float, nargs="+", default=[1, 5, 25, 50, 75, 95, 99])
+    serve_parser = subparsers.add_parser("serve", help="run the local simulation service")
+    serve_parser.add_argument("--host", default=service.SERVICE_HOST)
+    serve_parser.add_argument("--port", type=int, default=service.SERVICE_PORT)
+    serve_parser.add_argument("--workers", type=int, default=default_workers())
+    worker_parser = subparsers.add_parser("worker", help="run a cluster node that executes shards of jobs")
+    worker_parser.add_argument("--host", default=cluster.WORKER_HOST)
+    worker_parser.add_argument("--port", type=int, default=cluster.WORKER_PORT)
+    worker_parser.add_argument("--workers", type=int, default=default_workers())
+    args = parser.parse_args(argv)
+    if args.kind == "serve":
+        service.serve(args.host, args.port, args.workers)
+        return
+    if args.kind == "worker":
+        cluster.serve_worker(args.host, args.port, args.workers)
+        return
+    if args.kind == "percentiles":
+        fields = args.field or load_archive(args.archive).dtype.names
+        line = {
+            field: {f"p{q:g}": value for q, value in zip(args.q, archive_percentiles(args.archive, field, args.q))}
+            for field in fields
+        }
+        print(json.dumps(line), flush=True)
+        return
+    if args.kind == "compare":
+        if args.engine not in KINDS[args.compare_kind].engines:
+            parser.error(f"unknown {args.compare_kind} engine: {args.engine}")
+        run_compare(
+            args.compare_kind, args.config_a, args.config_b, args.iterations, args.seed, args.engine, args.workers,
+            args.antithetic,
+        )
+        return
+    if args.kind == "seek":
+        if args.engine not in KINDS[args.seek_kind].engines:
+            parser.error(f"unknown {args.seek_kind} engine: {args.engine}")
+        if args.goal not in METRICS[args.seek_kind]:
+            parser.error(f"unknown {args.seek_kind} goal: {args.goal}")
+        try:
+            run_seek(
+                args.seek_kind, args.config, args.field, args.low, args.high, args.goal, args.target, args.tolerance,
+                args.seed, args.engine, args.workers, args.confidence,
+            )
+        except ValueError as e:
+            # A bad config or range, or a target met (or missed) over the whole range
+            parser.error(str(e))
+        return
+    if args.nodes:
+        if args.instrument or args.profile or args.archive:
+            parser.error("--nodes cannot be combined with --instrument, --profile or --archive")
+        run_jobs_on_nodes(args.kind, args.jobs, args.iterations, args.seed, args.engine, args.nodes.split(","))
+        return
+    if args.profile:
+        instrumentation.profiled(
+            run_jobs_inline, args.kind, args.jobs, args.iterations, args.seed, args.engine, args.instrument,
+            args.archive, dump_path=args.profile,
+        )
+        return
+    run_jobs(
+        args.kind, args.jobs, args.iterations, args.seed, args.engine, args.workers, args.instrument, args.archive
+    )
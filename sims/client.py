@@ -0,0 +1,90 @@
+"""Blocking client of the local simulation service (see ``sims.service``)."""
+import itertools
+import json
+import socket
+import threading
+from typing import Iterator, NamedTuple
+
+from sims.service import SERVICE_HOST, SERVICE_PORT
+from sims.stats import BatchStats
+
+
+class ServiceError(Exception):
+    pass
+
+
+class JobUpdate(NamedTuple):
+    event: str  # "progress", "done" or "cancelled"
+    stats: BatchStats | None
+    precision: dict[str, float] | None
+
+
+class ServiceClient:
+    """One connection to the service; ``cancel`` may be called from another thread than ``run``."""
+
+    def __init__(self, host: str = SERVICE_HOST, port: int = SERVICE_PORT, timeout: float = 0.5):
+        self._socket = socket.create_connection((host, port), timeout=timeout)
+        self._socket.settimeout(None)
+        self._reader = self._socket.makefile("r", encoding="utf-8")
+        self._send_lock = threading.Lock()
+        self._request_ids = itertools.count(1)
+        self.job: int | None = None
+
+    @classmethod
+    def connect(cls, host: str = SERVICE_HOST, port: int = SERVICE_PORT) -> "ServiceClient | None":
+        """A client of the running service, or None when no service is listening."""
+        try:
+            return cls(host, port)
+        except OSError:
+            return None
+
+    def request(self, method: str, **params) -> int:
+        request_id = next(self._request_ids)
+        line = json.dumps({"id": request_id, "method": method, "params": params}, default=str) + "\n"
+        with self._send_lock:
+            self._socket.sendall(line.encode())
+        return request_id
+
+    def run(
+            self,
+            kind: str,
+            config: tuple,
+            iterations: int,
+            seed: int | None = None,
+            engine: str = "batch",
+            priority: int = 0,
+            target_error: float = 0.0,
+    ) -> Iterator[JobUpdate]:
+        """Submit a job and yield its updates until it is done or cancelled."""
+        request_id = self.request(
+            "submit", kind=kind, config=config._asdict(), iterations=iterations, seed=seed, engine=engine,
+            priority=priority, target_error=target_error,
+        )
+        for line in self._reader:
+            message = json.loads(line)
+            if message.get("id") == request_id:
+                if "error" in message:
+                    raise ServiceError(message["error"])
+                self.job = message["result"]["job"]
+            elif self.job is not None and message.get("job") == self.job:
+                if message["event"] == "error":
+                    raise ServiceError(message["error"])
+                stats = BatchStats.from_dict(message["stats"]) if "stats" in message else None
+                yield JobUpdate(message["event"], stats, message.get("precision"))
+                if message["event"] != "progress":
+                    return
+        raise ServiceError("service closed the connection")
+
+    def cancel(self):
+        if self.job is not None:
+            self.request("cancel", job=self.job)
+
+    def close(self):
+        self._reader.close()
+        self._socket.close()
+
+    def __enter__(self) -> "ServiceClient":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
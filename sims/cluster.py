@@ -0,0 +1,257 @@
+"""Sharded execution of one run over worker nodes reachable by TCP.
+
+``python -m sims worker --port 8800`` starts a node that runs chunks on its
+local pool. The coordinator splits the run into the chunks of a RunPlan,
+keeps every node busy up to its worker count and merges the BatchStats the
+nodes return in chunk order, so a seeded run ends on the same statistics
+however many nodes ran it. Chunks lost with a failed node, or failing on it,
+are retried on a node they have not failed on while one is reachable, and on
+the same node otherwise.
+
+Nodes speak JSON lines: ``{"id": ..., "method": "info" | "run_chunk", "params": {...}}``
+answered by ``{"id": ..., "result": ...}`` or ``{"id": ..., "error": ...}``,
+possibly out of order.
+"""
+import asyncio
+import itertools
+import json
+import multiprocessing
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator
+
+from sims.kinds import KINDS
+from sims.runner import Chunk, ChunkResult, PrecisionProgress, RunPlan, default_workers, run_chunk
+from sims.stats import BatchStats
+
+WORKER_HOST = "127.0.0.1"
+WORKER_PORT = 8800
+# Attempts of one chunk before the whole run fails
+MAX_ATTEMPTS = 3
+CONNECT_TIMEOUT = 5.0
+# A node that has not answered a chunk for this long is given up on, its chunks go to the others
+SHARD_TIMEOUT = 600.0
+# Longest reply line; partial statistics with many discrete values are far beyond asyncio's 64 KiB default
+REPLY_LIMIT = 64 * 1024 * 1024
+
+
+class ShardError(Exception):
+    pass
+
+
+class ClusterWorker:
+    """A node: runs the chunks it is sent on its own process pool."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        # Forked workers would inherit the client sockets and keep them open after the node dies
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def serve(self, host: str = WORKER_HOST, port: int = WORKER_PORT):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(self.answer(json.loads(line), writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except ConnectionError:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def answer(self, request: dict, writer: asyncio.StreamWriter):
+        try:
+            reply = {"id": request["id"], "result": await self.handle_request(request["method"], request["params"])}
+        except Exception as e:
+            reply = {"id": request["id"], "error": f"{type(e).__name__}: {e}"}
+        if not writer.is_closing():
+            writer.write((json.dumps(reply) + "\n").encode())
+            await writer.drain()
+
+    async def handle_request(self, method: str, params: dict) -> dict:
+        if method == "info":
+            return {"workers": self.workers}
+        if method == "run_chunk":
+            kind = KINDS[params["kind"]]
+            config = kind.config_from_save(params["config"])
+            chunk = Chunk(**params["chunk"])
+            loop = asyncio.get_running_loop()
+            chunk_result = await loop.run_in_executor(
+                self.executor, run_chunk, kind.engines[params["engine"]], config, chunk, True
+            )
+            return {"stats": chunk_result.result.to_dict(), "elapsed": chunk_result.elapsed}
+        raise ValueError(f"unknown method: {method}")
+
+
+class NodeConnection:
+    """Pipelined requests to one node; replies are matched to requests by id."""
+
+    def __init__(self, address: str):
+        self.address = address
+        self.capacity = 0
+        self.in_flight = 0
+        self.alive = False
+        self._request_ids = itertools.count(1)
+        self._pending: dict[int, asyncio.Future] = {}
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._listener: asyncio.Task | None = None
+
+    async def open(self):
+        host, port = self.address.rsplit(":", 1)
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(host, int(port), limit=REPLY_LIMIT), CONNECT_TIMEOUT
+        )
+        self._listener = asyncio.create_task(self._listen())
+        self.alive = True
+        self.capacity = (await self.call("info"))["workers"]
+
+    async def call(self, method: str, **params) -> dict:
+        request_id = next(self._request_ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        request = {"id": request_id, "method": method, "params": params}
+        self._writer.write((json.dumps(request, default=str) + "\n").encode())
+        await self._writer.drain()
+        return await future
+
+    async def _listen(self):
+        try:
+            while line := await self._reader.readline():
+                reply = json.loads(line)
+                future = self._pending.pop(reply["id"], None)
+                if future is None or future.done():
+                    continue
+                if "error" in reply:
+                    future.set_exception(ShardError(f"{self.address}: {reply['error']}"))
+                else:
+                    future.set_result(reply["result"])
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.alive = False
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(f"lost node {self.address}"))
+            self._pending.clear()
+
+    async def close(self):
+        self.alive = False
+        if self._listener:
+            self._listener.cancel()
+        if self._writer:
+            self._writer.close()
+
+
+def _take_retry(
+        retry: deque[Chunk], failed_on: dict[int, list], connection: "NodeConnection", connections: list
+) -> Chunk | None:
+    """The first chunk to retry on ``connection``: one that failed elsewhere, or that no other live node can take."""
+    for chunk in retry:
+        others = [
+            other for other in connections
+            if other.alive and other is not connection and other not in failed_on[chunk.index]
+        ]
+        if connection not in failed_on[chunk.index] or not others:
+            retry.remove(chunk)
+            return chunk
+    return None
+
+
+async def run_sharded(
+        nodes: list[str],
+        kind: str,
+        config: tuple,
+        iterations: int,
+        seed: int | None = None,
+        engine: str = "batch",
+        target_error: float = 0.0,
+) -> AsyncIterator[PrecisionProgress]:
+    """Run one job over ``nodes`` ("host:port"), yielding the progress of every merged chunk."""
+    plan = RunPlan(iterations, seed, KINDS[kind].precision_fields, target_error)
+    connections = [NodeConnection(address) for address in nodes]
+    await asyncio.gather(*(connection.open() for connection in connections), return_exceptions=True)
+    if not any(connection.alive for connection in connections):
+        raise ConnectionError(f"no reachable node among {', '.join(nodes)}")
+
+    retry: deque[Chunk] = deque()
+    # The nodes every chunk failed on, one entry per attempt
+    failed_on: defaultdict[int, list[NodeConnection]] = defaultdict(list)
+    tasks: dict[asyncio.Task, tuple[Chunk, NodeConnection]] = {}
+    try:
+        while not plan.done:
+            for connection in connections:
+                while connection.alive and connection.in_flight < connection.capacity:
+                    chunk = _take_retry(retry, failed_on, connection, connections) or plan.next_chunk()
+                    if chunk is None:
+                        break
+                    call = connection.call(
+                        "run_chunk", kind=kind, config=config._asdict(), engine=engine, chunk=chunk._asdict()
+                    )
+                    task = asyncio.create_task(asyncio.wait_for(call, SHARD_TIMEOUT))
+                    tasks[task] = chunk, connection
+                    connection.in_flight += 1
+            if not tasks:
+                if retry:
+                    raise ConnectionError("every node failed")
+                return
+            finished, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                chunk, connection = tasks.pop(task)
+                connection.in_flight -= 1
+                if task.exception() is not None:
+                    if isinstance(task.exception(), asyncio.TimeoutError):
+                        await connection.close()
+                    failed_on[chunk.index].append(connection)
+                    if len(failed_on[chunk.index]) >= MAX_ATTEMPTS:
+                        raise ShardError(f"chunk {chunk.index} failed {MAX_ATTEMPTS} times") from task.exception()
+                    retry.append(chunk)
+                    continue
+                reply = task.result()
+                chunk_result = ChunkResult(
+                    chunk=chunk,
+                    result=BatchStats.from_dict(reply["stats"]),
+                    elapsed=reply["elapsed"],
+                    finished_at=time.time(),
+                )
+                for progress in plan.add(chunk_result):
+                    yield progress
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*(connection.close() for connection in connections))
+
+
+def run_on_nodes(
+        nodes: list[str],
+        kind: str,
+        config: tuple,
+        iterations: int,
+        seed: int | None = None,
+        engine: str = "batch",
+        target_error: float = 0.0,
+) -> BatchStats:
+    """Blocking ``run_sharded`` that returns the final statistics."""
+    async def final_stats():
+        stats = None
+        async for progress in run_sharded(nodes, kind, config, iterations, seed, engine, target_error):
+            stats = progress.stats
+        return stats
+
+    return asyncio.run(final_stats())
+
+
+def serve_worker(host: str = WORKER_HOST, port: int = WORKER_PORT, workers: int | None = None):
+    worker = ClusterWorker(workers or default_workers())
+    try:
+        asyncio.run(worker.serve(host, port))
+    finally:
+        worker.executor.shutdown(cancel_futures=True)
@@ -0,0 +1,120 @@
+"""Paired A/B comparison of two configs.
+
+Simulation ``i`` of both configs runs on the same random stream, so most of
+the noise they share cancels out of the per-simulation difference ``B - A``.
+With ``antithetic`` every index also runs on the mirrored stream and the two
+differences are averaged, which cancels part of the remaining noise.
+"""
+import time
+from concurrent.futures import Executor
+from typing import Callable, Iterator, NamedTuple
+
+from sims.rng import SimulationStreams, resolve_seed
+from sims.runner import Chunk, ChunkResult, merge_in_order, plan_chunks
+from sims.stats import BatchStats, half_width
+
+
+class PairedStats(NamedTuple):
+    a: BatchStats
+    b: BatchStats
+    difference: BatchStats  # per index ``B - A``, averaged over the mirrored pair when antithetic
+    runs_per_index: int  # simulations of each config per index: 2 when antithetic
+
+    @property
+    def count(self) -> int:
+        return self.difference.count
+
+    def merge(self, other: "PairedStats") -> "PairedStats":
+        self.a.merge(other.a)
+        self.b.merge(other.b)
+        self.difference.merge(other.difference)
+        return self
+
+
+def _difference(batch_a: tuple, batch_b: tuple) -> tuple:
+    return type(batch_a)(*(b - a for a, b in zip(batch_a, batch_b)))
+
+
+def run_paired_chunk(
+        batch_fn: Callable, config_a: tuple, config_b: tuple, chunk: Chunk, antithetic: bool = False
+) -> ChunkResult:
+    """Run both configs on the streams of ``chunk`` and summarize A, B and their difference."""
+    started = time.perf_counter()
+    streams = SimulationStreams(chunk.seed, chunk.start)
+    batch_a = batch_fn(config_a, chunk.size, streams)
+    batch_b = batch_fn(config_b, chunk.size, streams)
+    difference = _difference(batch_a, batch_b)
+    a, b = BatchStats.from_batch(batch_a), BatchStats.from_batch(batch_b)
+    if antithetic:
+        mirrored = SimulationStreams(chunk.seed, chunk.start, antithetic=True)
+        mirrored_a = batch_fn(config_a, chunk.size, mirrored)
+        mirrored_b = batch_fn(config_b, chunk.size, mirrored)
+        mirrored_difference = _difference(mirrored_a, mirrored_b)
+        difference = type(difference)(*((d + m) / 2 for d, m in zip(difference, mirrored_difference)))
+        a.add_batch(mirrored_a)
+        b.add_batch(mirrored_b)
+    paired = PairedStats(a=a, b=b, difference=BatchStats.from_batch(difference), runs_per_index=1 + antithetic)
+    return ChunkResult(chunk=chunk, result=paired, elapsed=time.perf_counter() - started, finished_at=time.time())
+
+
+def run_comparison(
+        executor: Executor,
+        batch_fn: Callable,
+        config_a: tuple,
+        config_b: tuple,
+        iterations: int,
+        seed: int | None = None,
+        antithetic: bool = False,
+) -> Iterator[PairedStats]:
+    """Yield the paired statistics after each chunk, merged in chunk order."""
+    chunks = plan_chunks(iterations, resolve_seed(seed))
+    futures = [executor.submit(run_paired_chunk, batch_fn, config_a, config_b, chunk, antithetic) for chunk in chunks]
+    try:
+        for paired, _ in merge_in_order(future.result() for future in futures):
+            yield paired
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+class FieldComparison(NamedTuple):
+    field: str
+    mean_a: float
+    mean_b: float
+    difference: float
+    half_width: float
+    # How many more simulations independent A and B batches would need for the same interval
+    efficiency: float
+
+
+def compare_fields(paired: PairedStats, fields: tuple[str, ...], confidence: float = 0.95) -> list[FieldComparison]:
+    comparisons = []
+    for field in fields:
+        a, b, difference = paired.a.columns[field], paired.b.columns[field], paired.difference.columns[field]
+        # Independent batches of the same cost: Var(B - A) = Var(A) + Var(B) per simulation pair
+        paired_variance = difference.variance * paired.runs_per_index
+        independent_variance = a.variance + b.variance
+        efficiency = independent_variance / paired_variance if paired_variance else float("inf")
+        comparisons.append(FieldComparison(
+            field=field,
+            mean_a=a.mean,
+            mean_b=b.mean,
+            difference=difference.mean,
+            half_width=half_width(difference, confidence),
+            efficiency=efficiency,
+        ))
+    return comparisons
+
+
+def format_comparison(paired: PairedStats, fields: tuple[str, ...], confidence: float = 0.95) -> str:
+    lines = [f"Paired runs: {paired.count} x {paired.runs_per_index}"]
+    for comparison in compare_fields(paired, fields, confidence):
+        lines.append(f"{comparison.field}: A {comparison.mean_a:.2f}, B {comparison.mean_b:.2f}")
+        if comparison.half_width == 0:
+            lines.append("  identical in every paired run")
+            continue
+        lines.append(
+            f"  B - A = {comparison.difference:+.3f} ± {comparison.half_width:.3f} ({confidence:.0%} CI), "
+            f"x{comparison.efficiency:.1f} fewer runs than independent batches"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,71 @@
+"""Checked construction of simulation configs from saves, job lines and requests.
+
+A config dict comes either with the GUI labels of a save file ("Max Health",
+chances in percent) or with the config field names (chances as fractions).
+Keys that control the run rather than the simulated setup are let through.
+"""
+import decimal
+from typing import NamedTuple
+
+# Keys a save or a job line may carry besides the config itself
+RUN_KEYS = {"Iterations", "Target Error %", "Seed", "Engine", "iterations", "seed", "engine"}
+
+
+def parse_value(field: str, field_type: type, value):
+    """``value`` as ``field_type``, going through its text so that a JSON 2.6 stays Decimal('2.6')."""
+    try:
+        number = decimal.Decimal(str(value).strip())
+    except decimal.InvalidOperation:
+        raise ValueError(f"{field}: {value!r} is not a number") from None
+    if not number.is_finite():
+        raise ValueError(f"{field}: {value!r} is not a finite number")
+    if field_type is int:
+        if number != number.to_integral_value():
+            raise ValueError(f"{field}: {value!r} is not a whole number")
+        return int(number)
+    if field_type is decimal.Decimal:
+        return number
+    return field_type(number)
+
+
+def config_from_values(
+        config_type: type[NamedTuple],
+        values: dict,
+        labels: dict[str, str],
+        percents: set[str],
+        non_negative: set[str],
+) -> NamedTuple:
+    """Build ``config_type`` from ``values`` keyed by field names or by the save ``labels`` of the fields.
+
+    Fields in ``percents`` are given in percent under their labels. Chances must
+    lie in [0, 1], fields in ``non_negative`` may be zero and all others must be
+    positive; every ``*_min`` field may not exceed its ``*_max`` counterpart.
+    """
+    if any(field in values for field in config_type._fields):
+        names = {field: field for field in config_type._fields}
+    else:
+        names = {label: field for label, field in labels.items()}
+    unknown = set(values) - set(names) - RUN_KEYS
+    if unknown:
+        raise ValueError(f"unknown config fields: {', '.join(sorted(unknown))}")
+    missing = [name for name in names if name not in values]
+    if missing:
+        raise ValueError(f"missing config fields: {', '.join(missing)}")
+
+    fields = {}
+    for name, field in names.items():
+        value = parse_value(name, config_type.__annotations__[field], values[name])
+        if field in percents and name != field:
+            value /= 100
+        if field in percents and not 0 <= value <= 1:
+            raise ValueError(f"{name}: {values[name]!r} is not a chance between 0 and {1 if name == field else 100}")
+        if field in non_negative and value < 0:
+            raise ValueError(f"{name}: {values[name]!r} must not be negative")
+        if field not in percents | non_negative and value <= 0:
+            raise ValueError(f"{name}: {values[name]!r} must be positive")
+        fields[field] = value
+    for low in fields:
+        high = low.replace("_min", "_max") if low.endswith("_min") else low.replace("min_", "max_", 1)
+        if high != low and high in fields and fields[low] > fields[high]:
+            raise ValueError(f"{low} ({fields[low]}) exceeds {high} ({fields[high]})")
+    return config_type(**fields)
@@ -0,0 +1,48 @@
+import numpy as np
+
+# Below this length np.convolve beats the FFT round trip
+FFT_THRESHOLD = 64
+
+
+def apply_uniform_damage(masses: np.ndarray, min_damage: int, max_damage: int) -> np.ndarray:
+    """Apply a uniform ``min_damage..max_damage`` hit to mass vectors indexed by current health.
+
+    Mass that drops to zero health or below is removed.
+    """
+    max_health = masses.shape[-1] - 1
+    prefix = np.zeros(masses.shape[:-1] + (max_health + 2,))
+    np.cumsum(masses, axis=-1, out=prefix[..., 1:])
+    health = np.arange(max_health + 1)
+    high = np.minimum(health + max_damage, max_health) + 1
+    low = np.minimum(health + min_damage, max_health + 1)
+    damaged = (prefix[..., high] - prefix[..., low]) / (max_damage - min_damage + 1)
+    damaged[..., 0] = 0
+    return damaged
+
+
+def apply_regeneration(masses: np.ndarray, amount: int) -> np.ndarray:
+    """Shift mass vectors indexed by health up by ``amount``, capped at max health."""
+    if amount <= 0:
+        return masses
+    max_health = masses.shape[-1] - 1
+    shifted = np.zeros_like(masses)
+    if amount < max_health:
+        shifted[..., amount:max_health] = masses[..., :max_health - amount]
+    shifted[..., max_health] = masses[..., max(max_health - amount, 0):].sum(axis=-1)
+    return shifted
+
+
+def convolve(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Full convolution of two probability vectors, through the FFT when both are wide."""
+    if min(a.size, b.size) < FFT_THRESHOLD:
+        return np.convolve(a, b)
+    size = a.size + b.size - 1
+    fft_size = 1 << (size - 1).bit_length()
+    result = np.fft.irfft(np.fft.rfft(a, fft_size) * np.fft.rfft(b, fft_size), fft_size)[:size]
+    return np.maximum(result, 0)
+
+
+def roll_probability(chance: float) -> float:
+    """Probability that ``round(random(), 2) <= chance``, the hit check used by the engines."""
+    hits = [j for j in range(101) if j / 100 <= chance]
+    return sum(0.005 if j in (0, 100) else 0.01 for j in hits)
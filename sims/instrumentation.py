@@ -0,0 +1,124 @@
+"""Opt-in instrumentation of the simulators.
+
+Engines fetch ``current()`` once per batch and only count when it is not None,
+so a disabled run pays a single ``is None`` check per lockstep iteration.
+"""
+import cProfile
+import pstats
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Callable
+
+_current: "Instrumentation | None" = None
+
+
+class Instrumentation:
+    """Hot-path counters of the engines: RNG draws, loop iterations, regen ticks, respawns."""
+
+    def __init__(self):
+        self.counters: Counter = Counter()
+
+    def count(self, **counts: int):
+        self.counters.update(counts)
+
+
+def enable() -> Instrumentation:
+    global _current
+    _current = Instrumentation()
+    return _current
+
+
+def disable() -> Instrumentation | None:
+    global _current
+    instrumentation, _current = _current, None
+    return instrumentation
+
+
+def current() -> Instrumentation | None:
+    return _current
+
+
+@contextmanager
+def collect():
+    """Enable instrumentation for the block, yielding the collecting Instrumentation."""
+    previous = _current
+    instrumentation = enable()
+    try:
+        yield instrumentation
+    finally:
+        globals()["_current"] = previous
+
+
+def profiled(fn: Callable, *args, dump_path: str | None = None, print_top: int = 0, **kwargs):
+    """Call ``fn`` under cProfile, dump the stats to ``dump_path`` and/or print the top entries."""
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(fn, *args, **kwargs)
+    finally:
+        if dump_path:
+            profile.dump_stats(dump_path)
+        if print_top:
+            pstats.Stats(profile).sort_stats("cumulative").print_stats(print_top)
+
+
+class RunMonitor:
+    """Throughput and phase timings of one pool run, as seen from the dispatching thread.
+
+    ``sim`` is the time workers spent inside the engines, ``ipc`` the delay
+    between a worker finishing a chunk and the runner receiving it. Phases of
+    one thread do not overlap: time spent in a phase opened inside another one
+    only counts for the inner phase. Other threads, like the GUI drawing the
+    results, time their own phases.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.started = time.perf_counter()
+        self.simulations = 0
+        self.timings: defaultdict[str, float] = defaultdict(float)
+        self.counters: Counter = Counter()
+        # Per thread, the time taken by the phases nested in each open phase
+        self._local = threading.local()
+
+    def chunk_done(self, chunk_result):
+        self.simulations += chunk_result.chunk.size
+        self.timings["sim"] += chunk_result.elapsed
+        self.timings["ipc"] += max(time.time() - chunk_result.finished_at, 0.0)
+        if chunk_result.counters:
+            self.counters.update(chunk_result.counters)
+
+    @contextmanager
+    def phase(self, name: str):
+        nested = self._local.__dict__.setdefault("nested", [])
+        started = time.perf_counter()
+        nested.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.timings[name] += elapsed - nested.pop()
+            if nested:
+                nested[-1] += elapsed
+
+    @property
+    def wall(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self) -> float:
+        return self.simulations / self.wall if self.wall else 0.0
+
+    @property
+    def utilization(self) -> float:
+        """Share of the pool's capacity spent simulating; low values mean starved workers."""
+        return min(self.timings["sim"] / (self.wall * self.workers), 1.0) if self.wall else 0.0
+
+    def status(self) -> str:
+        phases = " ".join(f"{name} {seconds:.2f}s" for name, seconds in list(self.timings.items()))
+        line = f"{self.rate:,.0f} sims/s, workers {self.utilization:.0%} busy | {phases}"
+        if self.counters and self.simulations:
+            per_run = ", ".join(f"{name} {value / self.simulations:.1f}" for name, value in self.counters.items())
+            line += f"\nper run: {per_run}"
+        return line
@@ -0,0 +1,17 @@
+"""The simulations by name, as the CLI, the service and the cluster refer to them."""
+from typing import Callable, NamedTuple
+
+from sims import fighting, thieving
+
+
+class Kind(NamedTuple):
+    config_from_save: Callable[[dict], tuple]
+    engines: dict[str, Callable]
+    solver: Callable  # exact ``(config, count) -> BatchStats``, the "analytic" engine
+    precision_fields: tuple[str, ...]  # columns a precision target applies to
+
+
+KINDS = {
+    "fight": Kind(fighting.config_from_save, fighting.ENGINES, fighting.solve_battle, ("time", "enemy_killed")),
+    "thieve": Kind(thieving.config_from_save, thieving.ENGINES, thieving.sim_analytic, ("time", "money_earned")),
+}
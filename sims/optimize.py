@@ -0,0 +1,260 @@
+"""Goal seeking: the value of one config field at which a target is just met.
+
+A goal is a per-simulation metric whose mean must reach a target, e.g. the
+share of fights that last to the 5h cap must reach 0.95. The search bisects
+the range of the free field, assuming the metric is monotone in it. Each
+tested value runs chunks until the confidence interval of the metric mean
+excludes the target, so values far from the threshold are settled after one
+small batch and only those near it get more iterations. Every value uses the
+same seed, so the comparisons between them are not drowned in sampling noise.
+
+Each decision is made at ``1 - (1 - confidence) / decisions``. A decision
+looks at the interval after 1, 2, 4, ... chunks and once more at the budget,
+and each look spends an equal share of the decision's error rate, so looking
+repeatedly does not inflate it. Together the final bracket holds the
+threshold with at least ``confidence``.
+"""
+import math
+from concurrent.futures import Executor
+from decimal import Decimal
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+from sims.configs import parse_value
+from sims.rng import resolve_seed
+from sims.runner import ADAPTIVE_CHUNK_SIZE, Chunk, ChunkResult, run_chunk
+from sims.stats import StreamingStats, half_width
+
+FIGHT_CAP = 5 * 60 * 60
+THIEVING_CAP = 8 * 60 * 60
+# Simulations one tested value may use before it is declared too close to call
+POINT_BUDGET = 200_000
+# Bisection steps of a float field when no tolerance is given
+DEFAULT_STEPS = 8
+# Decimal fields are intervals on the 0.1 s tick of the simulations
+DECIMAL_TICK = Decimal("0.1")
+
+
+def _per_hour(amount: np.ndarray, time: np.ndarray) -> np.ndarray:
+    return np.divide(amount * 3600.0, time, out=np.zeros(len(time)), where=time > 0)
+
+
+def fight_reached_cap(batch) -> np.ndarray:
+    return (batch.time >= FIGHT_CAP).astype(np.float64)
+
+
+def kills_per_hour(batch) -> np.ndarray:
+    return _per_hour(batch.enemy_killed, batch.time)
+
+
+def thieving_reached_cap(batch) -> np.ndarray:
+    return (batch.time >= THIEVING_CAP).astype(np.float64)
+
+
+def gold_per_hour(batch) -> np.ndarray:
+    return _per_hour(batch.money_earned, batch.time)
+
+
+# Per-simulation metrics a goal can be set on, by simulation kind
+METRICS: dict[str, dict[str, Callable[[tuple], np.ndarray]]] = {
+    "fight": {"cap": fight_reached_cap, "kills_per_hour": kills_per_hour},
+    "thieve": {"cap": thieving_reached_cap, "gold_per_hour": gold_per_hour},
+}
+
+
+class SeekPoint(NamedTuple):
+    value: object
+    mean: float
+    half_width: float  # at the confidence each look of the test was made at
+    count: int
+    met: bool | None  # None when the budget ran out before the interval left the target
+
+
+class SeekResult(NamedTuple):
+    field: str
+    threshold: object  # the tested value closest to the boundary on the side that meets the target
+    low: object  # the threshold lies in [low, high] with at least ``confidence``
+    high: object
+    confidence: float
+    iterations: int
+    points: list[SeekPoint]
+    inconclusive: bool = False  # an end of the range was too close to call: no threshold, [low, high] is the range
+
+
+def evaluate_chunk(batch_fn: Callable, config: tuple, chunk: Chunk, metric: Callable) -> ChunkResult:
+    """Run one chunk in a worker and send back the statistics of the metric only."""
+    chunk_result = run_chunk(batch_fn, config, chunk)
+    stats = StreamingStats()
+    stats.add_many(metric(chunk_result.result))
+    return chunk_result._replace(result=stats)
+
+
+def look_counts(budget: int) -> list[int]:
+    """Merged chunk counts after which ``test_value`` checks the interval."""
+    chunk_count = math.ceil(budget / ADAPTIVE_CHUNK_SIZE)
+    return sorted({2 ** k for k in range(chunk_count.bit_length())} | {chunk_count})
+
+
+def look_confidence(confidence: float, budget: int) -> float:
+    """Confidence of each look, so that all the looks of one test together keep ``confidence``."""
+    return 1 - (1 - confidence) / len(look_counts(budget))
+
+
+def test_value(
+        executor: Executor,
+        batch_fn: Callable,
+        config: tuple,
+        metric: Callable,
+        target: float,
+        seed: int,
+        workers: int,
+        confidence: float,
+        budget: int = POINT_BUDGET,
+) -> tuple[StreamingStats, bool | None]:
+    """Whether the metric mean of ``config`` reaches ``target``, sampling until that is clear.
+
+    Chunks run ``workers`` at a time and are merged in chunk order. At each of
+    the ``look_counts`` the interval at ``look_confidence`` is checked, and the
+    test stops at the first look where it excludes the target: the answer is
+    wrong with probability at most ``1 - confidence``, and a seeded test
+    decides the same whatever the number of workers.
+    """
+    looks = set(look_counts(budget))
+    confidence = look_confidence(confidence, budget)
+    stats = StreamingStats()
+    start = 0
+    index = 0
+    while start < budget:
+        futures = []
+        while len(futures) < workers and start < budget:
+            chunk = Chunk(index=index, start=start, size=min(ADAPTIVE_CHUNK_SIZE, budget - start), seed=seed)
+            futures.append(executor.submit(evaluate_chunk, batch_fn, config, chunk, metric))
+            index += 1
+            start += chunk.size
+        try:
+            for future in futures:
+                chunk_result = future.result()
+                stats.merge(chunk_result.result)
+                if chunk_result.chunk.index + 1 in looks and abs(stats.mean - target) > half_width(stats, confidence):
+                    return stats, stats.mean >= target
+        finally:
+            for future in futures:
+                future.cancel()
+    return stats, None
+
+
+def _midpoint(low, high, field_type: type):
+    if field_type is int:
+        return (low + high) // 2
+    if field_type is Decimal:
+        return ((low + high) / 2).quantize(DECIMAL_TICK)
+    return field_type((low + high) / 2)
+
+
+def seek_threshold(
+        executor: Executor,
+        batch_fn: Callable,
+        config: tuple,
+        config_from_save: Callable[[dict], tuple],
+        field: str,
+        low,
+        high,
+        metric: Callable,
+        target: float,
+        workers: int,
+        seed: int | None = None,
+        confidence: float = 0.95,
+        tolerance: float | None = None,
+        budget: int = POINT_BUDGET,
+) -> SeekResult:
+    """Bisect ``field`` over [low, high] for where the mean of ``metric`` crosses ``target``.
+
+    The bracket shrinks until it is no wider than ``tolerance`` (one step for
+    integer fields, a 2**DEFAULT_STEPS-th of the range for others by default,
+    never below one tick for Decimal fields) or a tested value is too close to
+    call within ``budget`` simulations. When an end of the range is too close
+    to call the result is ``inconclusive``. Every tested config is checked by
+    ``config_from_save``, the ends of the range before anything runs.
+    """
+    if field not in config._fields:
+        raise ValueError(f"unknown config field: {field}")
+    field_type = type(config).__annotations__[field]
+    low, high = parse_value(field, field_type, low), parse_value(field, field_type, high)
+    if not low < high:
+        raise ValueError("the range of the field must be increasing")
+    if field_type is Decimal and (low % DECIMAL_TICK or high % DECIMAL_TICK):
+        raise ValueError(f"the range of {field} must lie on the {DECIMAL_TICK} s tick")
+    if field_type is int:
+        tolerance = max(1, math.ceil(tolerance or 1))
+    elif tolerance is None:
+        tolerance = (high - low) / 2 ** DEFAULT_STEPS
+    else:
+        tolerance = field_type(str(tolerance))
+    if field_type is Decimal:
+        tolerance = max(tolerance, DECIMAL_TICK)
+    # Both ends, then one decision per halving
+    decisions = 2 + max(0, math.ceil(math.log2(float(high - low) / float(tolerance))))
+    decision_confidence = 1 - (1 - confidence) / decisions
+    seed = resolve_seed(seed)
+    points = []
+
+    def configured(value) -> tuple:
+        return config_from_save({**config._asdict(), field: value})
+
+    # Values between two valid ends are valid too
+    for value in (low, high):
+        configured(value)
+
+    def test(value) -> bool | None:
+        stats, met = test_value(
+            executor, batch_fn, configured(value), metric, target, seed, workers, decision_confidence, budget,
+        )
+        interval = half_width(stats, look_confidence(decision_confidence, budget))
+        points.append(SeekPoint(value, stats.mean, interval, stats.count, met))
+        return met
+
+    def result(threshold, low, high, inconclusive: bool = False) -> SeekResult:
+        iterations = sum(point.count for point in points)
+        return SeekResult(field, threshold, low, high, confidence, iterations, points, inconclusive)
+
+    met_low, met_high = test(low), test(high)
+    if met_low is None or met_high is None:
+        return result(None, low, high, inconclusive=True)
+    if met_low == met_high:
+        raise ValueError(f"the target is {'met' if met_low else 'not met'} over the whole range of {field}")
+
+    # The side of the bracket that meets the target moves towards the other one
+    while high - low > tolerance:
+        middle = _midpoint(low, high, field_type)
+        if middle in (low, high):
+            break
+        met = test(middle)
+        if met is None:
+            return result(middle, low, high)
+        if met == met_high:
+            high = middle
+        else:
+            low = middle
+    return result(high if met_high else low, low, high)
+
+
+def format_seek_result(result: SeekResult, metric: str, target: float) -> str:
+    if result.inconclusive:
+        lines = [
+            f"inconclusive: an end of [{result.low}, {result.high}] is too close to mean {metric} {target:g} to call",
+            f"no threshold bracketed, {result.iterations:,} simulations",
+        ]
+    else:
+        lines = [
+            f"{result.field} = {result.threshold} reaches mean {metric} {target:g}",
+            f"threshold in [{result.low}, {result.high}] with {result.confidence:.0%} confidence, "
+            f"{result.iterations:,} simulations",
+        ]
+    lines.append("-" * 20)
+    for point in result.points:
+        verdict = {True: "met", False: "not met", None: "too close to call"}[point.met]
+        lines.append(
+            f"{point.value}: {point.mean:.4f} ± {point.half_width:.4f} ({point.count:,} runs) {verdict}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,113 @@
+"""Counter-based random streams: one independent stream per simulation index.
+
+Word ``counter`` of simulation ``index`` is a pure function of (seed, index,
+counter), so a run gives bit-identical samples however its indices are split
+into chunks, workers or machines, and two configs run with the same seed see
+the same random numbers simulation by simulation.
+"""
+import random
+from typing import Callable
+
+import numpy as np
+
+from sims import cancellation
+
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+_LOW32 = np.uint64(0xFFFFFFFF)
+
+
+def _mix(z: np.ndarray) -> np.ndarray:
+    """SplitMix64 finalizer, a bijective avalanche of 64-bit words, applied in place."""
+    z ^= z >> np.uint64(30)
+    z *= _MIX1
+    z ^= z >> np.uint64(27)
+    z *= _MIX2
+    z ^= z >> np.uint64(31)
+    return z
+
+
+def resolve_seed(seed: int | None) -> int:
+    """The seed itself, or fresh entropy to share between all chunks of an unseeded run."""
+    return int(np.random.SeedSequence().entropy) if seed is None else int(seed)
+
+
+class SimulationStreams:
+    """Random streams of simulations ``start``, ``start + 1``, ... of a run seeded with ``seed``.
+
+    ``antithetic`` streams return the bitwise complement of every word, which
+    mirrors each uniform ``u`` to ``1 - u`` and each integer draw within its range.
+    """
+
+    def __init__(self, seed: int | None = None, start: int = 0, antithetic: bool = False):
+        self.seed = resolve_seed(seed)
+        self.start = start
+        self.antithetic = antithetic
+        self.key = np.random.SeedSequence(self.seed).generate_state(1, np.uint64)[0]
+
+    def keys(self, n: int) -> np.ndarray:
+        """Per-simulation stream keys; engines retire them together with their lanes."""
+        indices = np.arange(self.start, self.start + n, dtype=np.uint64)
+        return _mix(indices * np.uint64(GOLDEN_GAMMA) + self.key)
+
+    def index_seeds(self, n: int) -> list[int]:
+        """Integer seeds for engines driven by the ``random`` module, one per simulation.
+
+        Those engines cannot mirror their draws: antithetic seeds are merely different ones.
+        """
+        seeds = self.keys(n)
+        return (~seeds if self.antithetic else seeds).tolist()
+
+    def draw(self, keys: np.ndarray, counter: int | np.ndarray) -> np.ndarray:
+        """64 random bits for word ``counter`` of every stream in ``keys``, or word ``counter[i]`` of stream ``i``."""
+        if isinstance(counter, np.ndarray):
+            # Array arithmetic wraps silently
+            offsets = (counter.astype(np.uint64) + np.uint64(1)) * np.uint64(GOLDEN_GAMMA)
+        else:
+            # Python ints wrap explicitly here, NumPy scalars would warn on the overflow
+            offsets = np.uint64((counter + 1) * GOLDEN_GAMMA % 2 ** 64)
+        words = _mix(keys + offsets)
+        return np.invert(words, out=words) if self.antithetic else words
+
+
+def uniform(words: np.ndarray) -> np.ndarray:
+    """Uniform floats in [0, 1) from the upper 32 bits of ``words``."""
+    return (words >> np.uint64(32)).astype(np.float64) * 2.0 ** -32
+
+
+def rounded_uniform_bound(chance: float, digits: int = 2) -> np.uint64:
+    """Bound such that ``words <= bound`` exactly where ``np.round(uniform(words), digits) <= chance``.
+
+    The engines roll ``round(u, 2) <= chance``; on raw words that is one comparison.
+    """
+    low, high = 0, 2 ** 32  # the predicate holds below ``high``, if anywhere
+    if not np.round(0.0, digits) <= chance:
+        raise ValueError(f"no uniform rolls at most {chance}")
+    while high - low > 1:
+        middle = (low + high) // 2
+        if np.round(middle * 2.0 ** -32, digits) <= chance:
+            low = middle
+        else:
+            high = middle
+    return np.uint64(low << 32 | 0xFFFFFFFF)
+
+
+def integers(words: np.ndarray, low: int, high: int) -> np.ndarray:
+    """Integers in [low, high) from the lower 32 bits of ``words`` (Lemire's multiply-shift)."""
+    return low + (((words & _LOW32) * np.uint64(high - low)) >> np.uint64(32)).astype(np.int64)
+
+
+def seeded_runs(engine: Callable, config: tuple, n: int, streams: SimulationStreams | None = None) -> list:
+    """Run a single-run engine driven by the ``random`` module ``n`` times.
+
+    ``random`` is reseeded from every simulation's own stream, so results do not
+    depend on how the runs are chunked.
+    """
+    streams = streams or SimulationStreams()
+    results = []
+    for seed in streams.index_seeds(n):
+        cancellation.check()
+        random.seed(seed)
+        results.append(engine(config))
+    return results
@@ -0,0 +1,273 @@
+import os
+import time
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, Executor, as_completed, wait
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+import numpy as np
+
+from sims import instrumentation
+from sims.buffers import BufferSpec, attach, write_batch
+from sims.rng import SimulationStreams, resolve_seed
+from sims.stats import BatchStats, relative_half_width
+
+# Enough chunks to keep a large pool busy when chunks finish unevenly. The plan
+# must not depend on the worker count, or neither would the merged statistics.
+TARGET_CHUNKS = 64
+MIN_CHUNK_SIZE = 500
+MAX_CHUNK_SIZE = 50_000
+# Small enough to stop close to the target, large enough to amortize a task
+ADAPTIVE_CHUNK_SIZE = 2_000
+
+
+class Chunk(NamedTuple):
+    index: int
+    start: int
+    size: int
+    seed: int  # seed of the whole run; simulation ``start + i`` uses stream ``start + i`` of it
+
+
+class ChunkResult(NamedTuple):
+    chunk: Chunk
+    # The batch itself, its BatchStats when summarized, None when written to a shared buffer unsummarized
+    result: tuple | BatchStats | None
+    elapsed: float
+    finished_at: float = 0.0  # wall clock, to measure the trip back to the parent process
+    counters: dict[str, int] | None = None  # engine counters when instrumented
+
+
+def default_workers() -> int:
+    return os.cpu_count() - 1 if os.cpu_count() > 1 else 1
+
+
+def plan_chunks(iterations: int, seed: int | None = None) -> list[Chunk]:
+    """Split ``iterations`` into chunks of consecutive simulation indices.
+
+    The plan depends on ``iterations`` only, so a seeded run merges the same
+    chunks whatever the number of workers or machines that run them.
+    """
+    if iterations <= 0:
+        return []
+    seed = resolve_seed(seed)
+    count = max(min(TARGET_CHUNKS, -(-iterations // MIN_CHUNK_SIZE)), -(-iterations // MAX_CHUNK_SIZE))
+    base, extra = divmod(iterations, count)
+    chunks = []
+    start = 0
+    for index in range(count):
+        size = base + (index < extra)
+        chunks.append(Chunk(index=index, start=start, size=size, seed=seed))
+        start += size
+    return chunks
+
+
+def run_chunk(
+        batch_fn: Callable,
+        config: tuple,
+        chunk: Chunk,
+        summarize: bool = False,
+        instrument: bool = False,
+        buffer: BufferSpec | None = None,
+) -> ChunkResult:
+    """Run one chunk; with ``buffer`` its records are written at their simulation indices."""
+    started = time.perf_counter()
+    streams = SimulationStreams(chunk.seed, chunk.start)
+    if instrument:
+        with instrumentation.collect() as collected:
+            result = batch_fn(config, chunk.size, streams)
+        counters = dict(collected.counters)
+    else:
+        result = batch_fn(config, chunk.size, streams)
+        counters = None
+    if buffer is not None:
+        write_batch(attach(buffer), chunk.start, result)
+    if summarize:
+        result = BatchStats.from_batch(result)
+    elif buffer is not None:
+        result = None
+    return ChunkResult(
+        chunk=chunk, result=result, elapsed=time.perf_counter() - started, finished_at=time.time(), counters=counters
+    )
+
+
+def run_chunks(
+        executor: Executor,
+        batch_fn: Callable,
+        config: tuple,
+        chunks: list[Chunk],
+        summarize: bool = False,
+        instrument: bool = False,
+        buffer: BufferSpec | None = None,
+) -> Iterator[ChunkResult]:
+    """Submit one task per chunk and yield chunk results as they complete.
+
+    With ``summarize`` workers send back mergeable BatchStats instead of the raw batch.
+    """
+    futures = [
+        executor.submit(run_chunk, batch_fn, config, chunk, summarize, instrument, buffer) for chunk in chunks
+    ]
+    try:
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # Closed early or failed: no chunk of the run is left queued or running in the pool
+        for future in futures:
+            future.cancel()
+        wait(futures)
+
+
+def _aggregation(monitor: "instrumentation.RunMonitor | None"):
+    return monitor.phase("aggregation") if monitor else nullcontext()
+
+
+def merge_in_order(
+        chunk_results: Iterable[ChunkResult],
+        monitor: "instrumentation.RunMonitor | None" = None,
+) -> Iterator[tuple[BatchStats, ChunkResult]]:
+    """Merge summarized chunk results in chunk order, whatever order they arrive in.
+
+    Floating point merges are not associative: a fixed order is what makes the
+    statistics of a seeded run bit-identical across worker counts. Yields the
+    merged statistics after each chunk, out of order arrivals are held back.
+    Merges are timed as the "aggregation" phase of ``monitor``.
+    """
+    held = {}
+    stats = None
+    next_index = 0
+    for chunk_result in chunk_results:
+        held[chunk_result.chunk.index] = chunk_result
+        while next_index in held:
+            chunk_result = held.pop(next_index)
+            with _aggregation(monitor):
+                stats = stats.merge(chunk_result.result) if stats else chunk_result.result
+            next_index += 1
+            yield stats, chunk_result
+
+
+class PrecisionProgress(NamedTuple):
+    stats: BatchStats
+    precision: dict[str, float] | None  # relative CI half width of each field mean, None in fixed mode
+    done: bool
+    chunk_result: ChunkResult | None = None  # the chunk merged last
+
+
+class RunPlan:
+    """Which chunks a run dispatches and when it is done, whoever executes the chunks.
+
+    With ``relative_error`` the run dispatches ``ADAPTIVE_CHUNK_SIZE`` chunks up to
+    ``iterations`` and stops at the first chunk, in chunk order, after which the
+    mean of every field is known within ``relative_error``. Otherwise it runs the
+    ``plan_chunks`` of ``iterations``. Either way results are merged in chunk
+    order, so a seeded run ends on the same statistics whatever runs its chunks.
+    """
+
+    def __init__(
+            self,
+            iterations: int,
+            seed: int | None = None,
+            fields: tuple[str, ...] = (),
+            relative_error: float = 0.0,
+            confidence: float = 0.95,
+    ):
+        self.iterations = iterations
+        self.seed = resolve_seed(seed)
+        self.fields = fields
+        self.relative_error = relative_error
+        self.confidence = confidence
+        self.adaptive = relative_error > 0
+        self.planned = [] if self.adaptive else plan_chunks(iterations, self.seed)
+        self.planned.reverse()
+        self.dispatched = 0
+        self.chunk_count = 0
+        self.stats: BatchStats | None = None
+        self.done = iterations <= 0
+        self._held: dict[int, ChunkResult] = {}
+        self._merged = 0
+
+    def next_chunk(self) -> Chunk | None:
+        """The next chunk to dispatch, or None when the run needs no more."""
+        if self.done:
+            return None
+        if not self.adaptive:
+            return self.planned.pop() if self.planned else None
+        if self.dispatched >= self.iterations:
+            return None
+        size = min(ADAPTIVE_CHUNK_SIZE, self.iterations - self.dispatched)
+        chunk = Chunk(index=self.chunk_count, start=self.dispatched, size=size, seed=self.seed)
+        self.dispatched += size
+        self.chunk_count += 1
+        return chunk
+
+    def add(self, chunk_result: ChunkResult) -> list[PrecisionProgress]:
+        """Take a summarized chunk result; returns the progress of every chunk it lets merge."""
+        if self.done:
+            return []
+        self._held[chunk_result.chunk.index] = chunk_result
+        progress = []
+        while not self.done and self._merged in self._held:
+            merged = self._held.pop(self._merged)
+            self._merged += 1
+            self.stats = self.stats.merge(merged.result) if self.stats else merged.result
+            precision = None
+            if self.adaptive:
+                precision = {
+                    field: relative_half_width(self.stats.columns[field], self.confidence) for field in self.fields
+                }
+                reached = all(value <= self.relative_error for value in precision.values())
+                self.done = reached or self.stats.count >= self.iterations
+            else:
+                self.done = self.stats.count >= self.iterations
+            progress.append(PrecisionProgress(self.stats, precision, self.done, merged))
+        return progress
+
+
+def run_until_precision(
+        executor: Executor,
+        batch_fn: Callable,
+        config: tuple,
+        fields: tuple[str, ...],
+        relative_error: float,
+        max_iterations: int,
+        workers: int,
+        seed: int | None = None,
+        confidence: float = 0.95,
+        instrument: bool = False,
+        buffer: BufferSpec | None = None,
+        monitor: "instrumentation.RunMonitor | None" = None,
+) -> Iterator[PrecisionProgress]:
+    """Dispatch chunks until the mean of every field is known within ``relative_error``.
+
+    At most ``workers`` chunks are in flight and nothing beyond ``max_iterations``
+    is ever dispatched; see RunPlan for when the run stops. Chunks still in
+    flight at that point are dropped. A ``buffer`` must hold ``max_iterations``
+    records; the first ``stats.count`` are the run, which then ends once its
+    chunks have left the pool, so the buffer is not freed under them. Merges
+    are timed as the "aggregation" phase of ``monitor``.
+    """
+    plan = RunPlan(max_iterations, seed, fields, relative_error, confidence)
+    in_flight = set()
+    try:
+        while True:
+            while len(in_flight) < workers and (chunk := plan.next_chunk()):
+                in_flight.add(executor.submit(run_chunk, batch_fn, config, chunk, True, instrument, buffer))
+            if not in_flight:
+                return
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                chunk_result = future.result()
+                with _aggregation(monitor):
+                    progress_updates = plan.add(chunk_result)
+                yield from progress_updates
+            if plan.done:
+                return
+    finally:
+        for future in in_flight:
+            future.cancel()
+        # Unless the run reached its target, it ends once its chunks have left the pool;
+        # chunks writing to a buffer are always waited for, its owner closes it next
+        if buffer is not None or not plan.done:
+            wait(in_flight)
+
+
+def concat_batches(batches: list[tuple]) -> tuple:
+    batch_type = type(batches[0])
+    return batch_type(*(np.concatenate(columns) for columns in zip(*batches)))
@@ -0,0 +1,195 @@
+"""Local simulation service: ``python -m sims serve``.
+
+One long-lived process owns a warm worker pool that every GUI and script on
+the machine shares, so concurrent runs queue for the cores instead of
+oversubscribing them. Clients speak JSON lines over TCP on localhost:
+
+    {"id": 1, "method": "submit", "params": {"kind": "fight", "config": {...}, "iterations": 5000}}
+    {"id": 2, "method": "cancel", "params": {"job": 1}}
+    {"id": 3, "method": "status"}
+
+Every request is answered with ``{"id": ..., "result": ...}`` or
+``{"id": ..., "error": ...}``. A submitted job then streams
+``{"job": ..., "event": "progress" | "done" | "cancelled" | "error", ...}``
+lines to the connection that submitted it; progress and done carry the
+partial statistics as ``BatchStats.to_dict``.
+"""
+import asyncio
+import itertools
+import json
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from typing import Callable
+
+from sims.kinds import KINDS
+from sims.runner import RunPlan, default_workers, run_chunk
+from sims.stats import BatchStats
+
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+# Partial statistics of a job are streamed at most this often; the last update always is
+PROGRESS_INTERVAL = 0.2
+
+
+class ServiceJob:
+    def __init__(self, job_id: int, priority: int, params: dict, send: Callable[[dict], None]):
+        kind = KINDS[params["kind"]]
+        self.id = job_id
+        self.priority = priority
+        self.send = send
+        self.config = kind.config_from_save(params["config"])
+        self.iterations = int(params.get("iterations", 5000))
+        self.engine = params.get("engine", "batch")
+        self.solver = kind.solver if self.engine == "analytic" else None
+        self.batch_fn = None if self.solver else kind.engines[self.engine]
+        self.plan = RunPlan(
+            self.iterations,
+            params.get("seed"),
+            tuple(params.get("fields", kind.precision_fields)),
+            float(params.get("target_error", 0.0)),
+            float(params.get("confidence", 0.95)),
+        )
+        self.in_flight = 0
+        self.solver_started = False
+        self.last_progress = 0.0
+
+    def next_task(self) -> tuple | None:
+        """Arguments of the next pool task of this job, if it has one to run now."""
+        if self.solver:
+            if self.solver_started:
+                return None
+            self.solver_started = True
+            return self.solver, self.config, self.iterations
+        if chunk := self.plan.next_chunk():
+            return run_chunk, self.batch_fn, self.config, chunk, True
+        return None
+
+    def report(self, stats: BatchStats, precision: dict[str, float] | None, done: bool):
+        now = time.monotonic()
+        if not done and now - self.last_progress < PROGRESS_INTERVAL:
+            return
+        self.last_progress = now
+        self.send({
+            "job": self.id,
+            "event": "done" if done else "progress",
+            "count": stats.count,
+            "stats": stats.to_dict(),
+            "precision": precision,
+        })
+
+
+class SimulationService:
+    """Job queue in front of one warm ProcessPoolExecutor.
+
+    Jobs are split into chunks and a freed worker always takes the next chunk
+    of the highest-priority job (oldest first on ties), so a new urgent job
+    overtakes running ones within a chunk.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.jobs: dict[int, ServiceJob] = {}
+        self.in_flight = 0
+        self._job_ids = itertools.count(1)
+
+    async def serve(self, host: str = SERVICE_HOST, port: int = SERVICE_PORT):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        def send(message: dict):
+            if not writer.is_closing():
+                writer.write((json.dumps(message, default=str) + "\n").encode())
+
+        owned: set[int] = set()
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError as e:
+                    send({"id": None, "error": f"invalid JSON: {e}"})
+                    continue
+                try:
+                    result = self.handle_request(request.get("method"), request.get("params", {}), send, owned)
+                    send({"id": request.get("id"), "result": result})
+                except Exception as e:
+                    send({"id": request.get("id"), "error": f"{type(e).__name__}: {e}"})
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            # Nobody is left to read the results of a disconnected client
+            for job_id in owned:
+                self.cancel(job_id)
+            writer.close()
+
+    def handle_request(self, method: str, params: dict, send: Callable[[dict], None], owned: set[int]):
+        if method == "submit":
+            job = ServiceJob(next(self._job_ids), int(params.get("priority", 0)), params, send)
+            self.jobs[job.id] = job
+            owned.add(job.id)
+            self.fill_workers()
+            return {"job": job.id}
+        if method == "cancel":
+            return {"cancelled": self.cancel(int(params["job"]))}
+        if method == "status":
+            return {
+                "workers": self.workers,
+                "in_flight": self.in_flight,
+                "jobs": [
+                    {"job": job.id, "priority": job.priority, "count": job.plan.stats.count if job.plan.stats else 0}
+                    for job in self.jobs.values()
+                ],
+            }
+        raise ValueError(f"unknown method: {method}")
+
+    def cancel(self, job_id: int) -> bool:
+        """Drop a job; its chunks already on a worker finish but are ignored."""
+        job = self.jobs.pop(job_id, None)
+        if job:
+            job.send({"job": job_id, "event": "cancelled"})
+        return job is not None
+
+    def fill_workers(self):
+        loop = asyncio.get_running_loop()
+        for job in sorted(self.jobs.values(), key=lambda job: (-job.priority, job.id)):
+            # A job never holds more than ``workers`` chunks, so a precision run cannot overshoot by much
+            while self.in_flight < self.workers and job.in_flight < self.workers and (task := job.next_task()):
+                future = loop.run_in_executor(self.executor, *task)
+                future.add_done_callback(partial(self.task_done, job))
+                job.in_flight += 1
+                self.in_flight += 1
+            if self.in_flight >= self.workers:
+                return
+
+    def task_done(self, job: ServiceJob, future: Future):
+        job.in_flight -= 1
+        self.in_flight -= 1
+        if self.jobs.get(job.id) is job:
+            try:
+                self.take_result(job, future.result())
+            except Exception as e:
+                del self.jobs[job.id]
+                job.send({"job": job.id, "event": "error", "error": f"{type(e).__name__}: {e}"})
+        self.fill_workers()
+
+    def take_result(self, job: ServiceJob, result):
+        if job.solver:
+            job.report(result, None, True)
+            del self.jobs[job.id]
+            return
+        for progress in job.plan.add(result):
+            job.report(progress.stats, progress.precision, progress.done)
+        if job.plan.done:
+            del self.jobs[job.id]
+
+
+def serve(host: str = SERVICE_HOST, port: int = SERVICE_PORT, workers: int | None = None):
+    service = SimulationService(workers or default_workers())
+    try:
+        asyncio.run(service.serve(host, port))
+    finally:
+        service.executor.shutdown(cancel_futures=True)
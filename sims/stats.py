@@ -0,0 +1,399 @@
+import heapq
+import math
+from statistics import NormalDist
+
+import numpy as np
+
+TAIL_SIZE = 500
+
+
+class TDigest:
+    """Mergeable quantile sketch.
+
+    Values are kept as weighted centroids, small near both tails and large in
+    the middle, so extreme quantiles stay accurate in bounded memory. While
+    fewer than ``compression`` values have been seen, quantiles are exact.
+    """
+
+    def __init__(self, compression: int = 1000):
+        self.compression = compression
+        self.means = np.empty(0, dtype=np.float64)
+        self.weights = np.empty(0, dtype=np.float64)
+        self._buffer: list[np.ndarray] = []
+        self._buffered = 0
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum()) + self._buffered
+
+    def add_many(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if not values.size:
+            return
+        self._buffer.append(values)
+        self._buffered += values.size
+        if self._buffered + self.means.size > 5 * self.compression:
+            self._compress()
+
+    def merge(self, other: "TDigest"):
+        other._compress()
+        self._compress()
+        self.means = np.concatenate([self.means, other.means])
+        self.weights = np.concatenate([self.weights, other.weights])
+        self._compress(force=True)
+
+    def quantile(self, q: float) -> float:
+        self._compress()
+        if not self.means.size:
+            return math.nan
+        # Centroid centres expressed as positions in the sorted sample
+        positions = np.cumsum(self.weights) - self.weights + (self.weights - 1) / 2
+        return float(np.interp(q * (self.weights.sum() - 1), positions, self.means))
+
+    def to_dict(self) -> dict:
+        self._compress()
+        return {"compression": self.compression, "means": self.means.tolist(), "weights": self.weights.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TDigest":
+        digest = cls(data["compression"])
+        digest.means = np.array(data["means"], dtype=np.float64)
+        digest.weights = np.array(data["weights"], dtype=np.float64)
+        return digest
+
+    def _compress(self, force: bool = False):
+        if not self._buffer and not force:
+            return
+        buffered = np.concatenate(self._buffer) if self._buffer else np.empty(0)
+        self._buffer = []
+        self._buffered = 0
+        means = np.concatenate([self.means, buffered])
+        weights = np.concatenate([self.weights, np.ones(buffered.size)])
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+
+        total = weights.sum()
+        if means.size <= self.compression:
+            self.means, self.weights = means, weights
+            return
+        # k1 scale function: bucket index grows fastest near q=0 and q=1
+        q = (np.cumsum(weights) - weights / 2) / total
+        bucket = np.floor(self.compression / (2 * math.pi) * np.arcsin(2 * q - 1)).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        merged_weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / merged_weights
+        self.weights = merged_weights
+
+
+class StreamingStats:
+    """Mergeable running statistics of a single numeric column.
+
+    Keeps Welford mean/variance, min/max, a TDigest for quantiles and heaps with
+    the ``tail_size`` smallest and largest values.
+    """
+
+    def __init__(self, tail_size: int = TAIL_SIZE):
+        self.tail_size = tail_size
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.digest = TDigest()
+        self._largest: list[float] = []  # min-heap of the largest values
+        self._smallest: list[float] = []  # min-heap of the negated smallest values
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    @property
+    def median(self) -> float:
+        return self.quantile(0.5)
+
+    def quantile(self, q: float) -> float:
+        return min(max(self.digest.quantile(q), self.min), self.max)
+
+    def lowest_mean(self, k: int = TAIL_SIZE) -> float:
+        values = sorted(-v for v in self._smallest)[:k]
+        return float(np.mean(values)) if values else math.nan
+
+    def highest_mean(self, k: int = TAIL_SIZE) -> float:
+        values = sorted(self._largest, reverse=True)[:k]
+        return float(np.mean(values)) if values else math.nan
+
+    def add(self, value: float):
+        self.add_many(np.array([value], dtype=np.float64))
+
+    def add_many(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if not values.size:
+            return
+        self._combine(values.size, float(values.mean()), float(((values - values.mean()) ** 2).sum()))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.digest.add_many(values)
+
+        k = self.tail_size
+        if values.size > k:
+            largest = np.partition(values, values.size - k)[-k:]
+            smallest = np.partition(values, k - 1)[:k]
+        else:
+            largest = smallest = values
+        self._push_tails(largest.tolist(), smallest.tolist())
+
+    def merge(self, other: "StreamingStats") -> "StreamingStats":
+        if other.count:
+            self._combine(other.count, other.mean, other._m2)
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self.digest.merge(other.digest)
+            self._push_tails(other._largest, [-v for v in other._smallest])
+        return self
+
+    def to_dict(self) -> dict:
+        """Plain JSON-compatible state, enough to keep merging on another process or machine."""
+        return {
+            "type": "streaming",
+            "tail_size": self.tail_size,
+            "count": self.count,
+            "mean": self.mean,
+            "m2": self._m2,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "digest": self.digest.to_dict(),
+            "largest": self._largest,
+            "smallest": self._smallest,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "StreamingStats":
+        stats = cls(data["tail_size"])
+        stats.count = data["count"]
+        stats.mean = data["mean"]
+        stats._m2 = data["m2"]
+        if stats.count:
+            stats.min, stats.max = data["min"], data["max"]
+        stats.digest = TDigest.from_dict(data["digest"])
+        # Heap order survives the round trip since lists keep their order
+        stats._largest = list(data["largest"])
+        stats._smallest = list(data["smallest"])
+        return stats
+
+    def _combine(self, count: int, mean: float, m2: float):
+        # Chan et al. parallel update of Welford's running moments
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self._m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    def _push_tails(self, largest: list[float], smallest: list[float]):
+        for value in largest:
+            if len(self._largest) < self.tail_size:
+                heapq.heappush(self._largest, value)
+            elif value > self._largest[0]:
+                heapq.heapreplace(self._largest, value)
+        for value in smallest:
+            if len(self._smallest) < self.tail_size:
+                heapq.heappush(self._smallest, -value)
+            elif -value > self._smallest[0]:
+                heapq.heapreplace(self._smallest, -value)
+
+
+class DiscreteDistribution:
+    """Exact distribution of a column, exposing the same read API as StreamingStats.
+
+    Tail means are taken over the same share of outcomes as the ``k`` of ``count``
+    runs a Monte Carlo of ``count`` iterations would use.
+    """
+
+    def __init__(self, values: np.ndarray, probabilities: np.ndarray, count: int = 5000):
+        order = np.argsort(values, kind="stable")
+        self.values = np.asarray(values, dtype=np.float64)[order]
+        self.probabilities = np.asarray(probabilities, dtype=np.float64)[order]
+        self.probabilities /= self.probabilities.sum()
+        self.count = count
+        self.mean = float(self.values @ self.probabilities)
+        support = self.values[self.probabilities > 1e-12]
+        self.min = float(support[0])
+        self.max = float(support[-1])
+
+    @property
+    def variance(self) -> float:
+        return float(((self.values - self.mean) ** 2) @ self.probabilities)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    @property
+    def median(self) -> float:
+        return self.quantile(0.5)
+
+    def quantile(self, q: float) -> float:
+        cdf = np.cumsum(self.probabilities)
+        index = min(int(np.searchsorted(cdf, q - 1e-12)), self.values.size - 1)
+        return float(self.values[index])
+
+    def lowest_mean(self, k: int = TAIL_SIZE) -> float:
+        return self._tail_mean(self.values, self.probabilities, min(k / self.count, 1.0))
+
+    def highest_mean(self, k: int = TAIL_SIZE) -> float:
+        return self._tail_mean(self.values[::-1], self.probabilities[::-1], min(k / self.count, 1.0))
+
+    def to_dict(self) -> dict:
+        return {
+            "type": "discrete",
+            "values": self.values.tolist(),
+            "probabilities": self.probabilities.tolist(),
+            "count": self.count,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DiscreteDistribution":
+        return cls(np.array(data["values"]), np.array(data["probabilities"]), data["count"])
+
+    @staticmethod
+    def _tail_mean(values: np.ndarray, probabilities: np.ndarray, share: float) -> float:
+        # Mass taken from each value until ``share`` of the distribution is covered
+        taken = np.clip(share - (np.cumsum(probabilities) - probabilities), 0, probabilities)
+        return float(values @ taken / taken.sum())
+
+
+class ExactMoments:
+    """Exact mean, standard deviation and range of a column whose distribution is not known.
+
+    Quantiles and tail means are NaN, so they are never mistaken for sampled ones.
+    """
+
+    def __init__(self, mean: float, variance: float, minimum: float, maximum: float, count: int = 5000):
+        self.mean = mean
+        self.variance = variance
+        self.min = minimum
+        self.max = maximum
+        self.count = count
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    @property
+    def median(self) -> float:
+        return math.nan
+
+    def quantile(self, q: float) -> float:
+        return math.nan
+
+    def lowest_mean(self, k: int = TAIL_SIZE) -> float:
+        return math.nan
+
+    def highest_mean(self, k: int = TAIL_SIZE) -> float:
+        return math.nan
+
+    def to_dict(self) -> dict:
+        return {
+            "type": "moments",
+            "mean": self.mean,
+            "variance": self.variance,
+            "min": self.min,
+            "max": self.max,
+            "count": self.count,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ExactMoments":
+        return cls(data["mean"], data["variance"], data["min"], data["max"], data["count"])
+
+
+def half_width(column: StreamingStats, confidence: float = 0.95) -> float:
+    """Half width of the normal confidence interval of the column mean."""
+    if column.count < 2:
+        return math.inf
+    return NormalDist().inv_cdf((1 + confidence) / 2) * column.std / math.sqrt(column.count)
+
+
+def relative_half_width(column: StreamingStats, confidence: float = 0.95) -> float:
+    """Half width of the normal confidence interval of the column mean, relative to the mean."""
+    if column.count < 2:
+        return math.inf
+    width = half_width(column, confidence)
+    if column.mean == 0:
+        return 0.0 if width == 0 else math.inf
+    return width / abs(column.mean)
+
+
+class BatchStats:
+    """One StreamingStats per column of a FightingSimBatch / ThievingSimBatch.
+
+    Exact solvers fill the columns with DiscreteDistribution, or ExactMoments
+    where only the moments are exact, instead.
+    """
+
+    def __init__(self, fields: tuple[str, ...], tail_size: int = TAIL_SIZE):
+        self.fields = fields
+        self.columns = {field: StreamingStats(tail_size) for field in fields}
+
+    @classmethod
+    def from_batch(cls, batch: tuple, tail_size: int = TAIL_SIZE) -> "BatchStats":
+        stats = cls(batch._fields, tail_size)
+        stats.add_batch(batch)
+        return stats
+
+    @classmethod
+    def from_columns(
+            cls, columns: dict[str, StreamingStats | DiscreteDistribution | ExactMoments]
+    ) -> "BatchStats":
+        stats = cls(tuple(columns))
+        stats.columns = dict(columns)
+        return stats
+
+    @property
+    def count(self) -> int:
+        return self.columns[self.fields[0]].count
+
+    def add_batch(self, batch: tuple):
+        for field, values in zip(batch._fields, batch):
+            self.columns[field].add_many(values)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Plain dict of the headline numbers of every column, e.g. for JSON output."""
+        return {
+            field: {
+                "mean": column.mean,
+                "std": column.std,
+                "min": column.min,
+                "median": column.median,
+                "max": column.max,
+            }
+            for field, column in self.columns.items()
+        }
+
+    def merge(self, other: "BatchStats") -> "BatchStats":
+        for field, column in other.columns.items():
+            self.columns[field].merge(column)
+        return self
+
+    def to_dict(self) -> dict:
+        return {"columns": {field: column.to_dict() for field, column in self.columns.items()}}
+
+    def copy(self) -> "BatchStats":
+        """Independent snapshot, for another thread to read while this one keeps merging."""
+        return BatchStats.from_dict(self.to_dict())
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BatchStats":
+        column_types = {"streaming": StreamingStats, "discrete": DiscreteDistribution, "moments": ExactMoments}
+        return cls.from_columns({
+            field: column_types[column["type"]].from_dict(column) for field, column in data["columns"].items()
+        })
+
+    def __getattr__(self, field: str) -> StreamingStats:
+        try:
+            return self.__dict__["columns"][field]
+        except KeyError:
+            raise AttributeError(field) from None
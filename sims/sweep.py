@@ -0,0 +1,101 @@
+import decimal
+import itertools
+from concurrent.futures import Executor, as_completed
+from typing import Callable, Iterator, NamedTuple
+
+from sims.rng import resolve_seed
+from sims.runner import merge_in_order, plan_chunks, run_chunk
+from sims.stats import BatchStats
+
+
+class SweepPoint(NamedTuple):
+    values: dict[str, object]
+    config: tuple
+    stats: BatchStats
+
+
+def value_range(start: str, stop: str, step: str) -> list[decimal.Decimal]:
+    """Inclusive range, computed in Decimal so that 0.1 steps do not drift."""
+    start, stop, step = decimal.Decimal(start), decimal.Decimal(stop), decimal.Decimal(step)
+    if step <= 0:
+        raise ValueError("step must be positive")
+    values = []
+    value = start
+    while value <= stop:
+        values.append(value)
+        value += step
+    return values
+
+
+def sweep_grid(
+        base_config: tuple, ranges: dict[str, list], config_from_save: Callable[[dict], tuple]
+) -> list[tuple[dict[str, object], tuple]]:
+    """Every combination of ``ranges`` applied to ``base_config``, each checked by ``config_from_save``.
+
+    Values are in config units, as in a job line: a whole number field takes no
+    fraction, chances lie in [0, 1] and no ``*_min`` exceeds its ``*_max``.
+    """
+    for field in ranges:
+        if field not in base_config._fields:
+            raise ValueError(f"Unknown config field: {field}")
+    grid = []
+    for combination in itertools.product(*ranges.values()):
+        config = config_from_save({**base_config._asdict(), **dict(zip(ranges, combination))})
+        grid.append(({field: getattr(config, field) for field in ranges}, config))
+    return grid
+
+
+def run_sweep(
+        executor: Executor,
+        batch_fn: Callable,
+        base_config: tuple,
+        ranges: dict[str, list],
+        config_from_save: Callable[[dict], tuple],
+        iterations: int,
+        seed: int | None = None,
+) -> Iterator[SweepPoint]:
+    """Run every grid point and yield each one once all of its chunks are done.
+
+    All grid points use the same seed, so simulation ``i`` of every point sees the
+    same random stream (common random numbers) and the differences between
+    points are not drowned in sampling noise.
+    """
+    seed = resolve_seed(seed)
+    grid = sweep_grid(base_config, ranges, config_from_save)
+    chunks = plan_chunks(iterations, seed)
+
+    futures = {}
+    for point, (values, config) in enumerate(grid):
+        for chunk in chunks:
+            futures[executor.submit(run_chunk, batch_fn, config, chunk, True)] = point
+
+    received: dict[int, list] = {point: [] for point in range(len(grid))}
+    try:
+        for future in as_completed(futures):
+            point = futures[future]
+            received[point].append(future.result())
+            if len(received[point]) == len(chunks):
+                values, config = grid[point]
+                *_, (stats, _) = merge_in_order(received.pop(point))
+                yield SweepPoint(values=values, config=config, stats=stats)
+    finally:
+        # Closed early or failed: nothing of the sweep is left queued in a shared pool
+        for future in futures:
+            future.cancel()
+
+
+def format_sweep_table(points: list[SweepPoint], fields: tuple[str, ...]) -> str:
+    """One row per grid point with the swept values and the mean ± std of ``fields``."""
+    if not points:
+        return ""
+    points = sorted(points, key=lambda point: tuple(point.values.values()))
+    swept = list(points[0].values)
+    header = [*swept, *fields]
+    rows = [
+        [str(point.values[field]) for field in swept]
+        + [f"{point.stats.columns[field].mean:.1f} ± {point.stats.columns[field].std:.1f}" for field in fields]
+        for point in points
+    ]
+    widths = [max(len(cell) for cell in column) for column in zip(header, *rows)]
+    lines = ["  ".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in [header, *rows]]
+    return "\n".join(lines)
@@ -1,11 +1,23 @@
 import random
 import decimal
-from typing import NamedTuple
+import math
+from fractions import Fraction
+from functools import partial
+from typing import Callable, NamedTuple
 
 import numpy as np
 from tqdm import tqdm
 
 from core import sec_to_time
+from sims import cancellation, instrumentation, rng
+from sims.configs import config_from_values
+from sims.distributions import apply_regeneration, apply_uniform_damage
+from sims.rng import SimulationStreams, seeded_runs
+from sims.stats import BatchStats, DiscreteDistribution, ExactMoments
+
+
+# State cells sim_analytic pushes forward for exact counter distributions, about two seconds of work
+ANALYTIC_CELL_LIMIT = 60_000_000
 
 
 class ThievingSimResult(NamedTuple):
@@ -16,6 +28,32 @@ class ThievingSimResult(NamedTuple):
     thieving_count: int
 
 
+class ThievingSimBatch(NamedTuple):
+    """Columnar counterpart of ThievingSimResult: one array entry per simulated thief."""
+    time: np.ndarray
+    money_earned: np.ndarray
+    success_thieving_count: np.ndarray
+    failed_thieving_count: np.ndarray
+    thieving_count: np.ndarray
+
+    @classmethod
+    def from_results(cls, results: list[ThievingSimResult]) -> "ThievingSimBatch":
+        return cls(
+            time=np.array([float(r.time) for r in results], dtype=np.float64),
+            money_earned=np.array([r.money_earned for r in results], dtype=np.int64),
+            success_thieving_count=np.array([r.success_thieving_count for r in results], dtype=np.int64),
+            failed_thieving_count=np.array([r.failed_thieving_count for r in results], dtype=np.int64),
+            thieving_count=np.array([r.thieving_count for r in results], dtype=np.int64),
+        )
+
+    @property
+    def size(self) -> int:
+        return len(self.time)
+
+    def to_results(self) -> list[ThievingSimResult]:
+        return [ThievingSimResult(*row) for row in zip(*(column.tolist() for column in self))]
+
+
 class ThievingSimConfig(NamedTuple):
     health_regeneration_interval: int  # in seconds
     health_regeneration_amount: int
@@ -28,6 +66,29 @@ class ThievingSimConfig(NamedTuple):
     max_gold: int
 
 
+# Labels of the fields in ``.thsave`` files
+SAVE_LABELS = {
+    "Health Regeneration Interval": "health_regeneration_interval",
+    "Health Regeneration Amount": "health_regeneration_amount",
+    "Max Health": "max_health",
+    "Steal Interval": "steal_interval",
+    "Steal Success Chance": "steal_success_chance",
+    "Min Damage": "min_damage",
+    "Max Damage": "max_damage",
+    "Min Gold": "min_gold",
+    "Max Gold": "max_gold",
+}
+
+
+def config_from_save(values: dict) -> ThievingSimConfig:
+    """Build a config from a ``.thsave`` dict (GUI labels) or from a dict of config fields."""
+    return config_from_values(
+        ThievingSimConfig, values, SAVE_LABELS,
+        percents={"steal_success_chance"},
+        non_negative={"health_regeneration_amount", "min_damage", "min_gold", "max_gold"},
+    )
+
+
 def sim(config: ThievingSimConfig) -> ThievingSimResult:
     # Variables
     current_health = config.max_health
@@ -72,21 +133,404 @@ def sim(config: ThievingSimConfig) -> ThievingSimResult:
     )
 
 
-def format_thieve_results(results: list[ThievingSimResult]) -> str:
-    sims_seconds = [s.time for s in results]
-    sims_money_earned = [s.money_earned for s in results]
-    success_thieving_count_mean = np.mean([s.success_thieving_count for s in results])
-    failed_thieving_count_mean = np.mean([s.failed_thieving_count for s in results])
-    thieving_count_mean = np.mean([s.thieving_count for s in results])
+def _deciseconds(interval) -> int:
+    """Period, in 0.1s ticks, of the times ``t`` where ``t % interval == 0`` holds in ``sim``."""
+    return (Fraction(interval) * 10).numerator
+
+
+def sim_events(config: ThievingSimConfig) -> ThievingSimResult:
+    """Event-driven version of ``sim``.
+
+    Time is kept in integer deciseconds and jumps from one steal attempt to the
+    next, the regeneration ticks in between are counted arithmetically. Random
+    numbers are drawn in the same order as in ``sim``, so both engines give the
+    same result for the same ``random`` state.
+    """
+    steal_period = _deciseconds(config.steal_interval)
+    regen_period = _deciseconds(config.health_regeneration_interval)
+    # After a stun the next attempt is the first steal time past the 3s stun
+    stunned_period = -(-31 // steal_period) * steal_period
+    end = 60 * 60 * 8 * 10
+
+    # Local bindings: the attempt loop is bound by the cost of these calls
+    rand = random.random
+    getrandbits = random.getrandbits
+    success_chance = config.steal_success_chance
+    damage_range = config.max_damage - config.min_damage + 1
+    damage_bits = damage_range.bit_length()
+    gold_range = config.max_gold - config.min_gold + 1
+    gold_bits = gold_range.bit_length()
+
+    current_health = config.max_health
+    gold_earn = 0
+    success_thieving_count = 0
+    failed_thieving_count = 0
+    thieving_count = 0
+    time = 0
+
+    while time < end:
+        thieving_count += 1
+        if rand() > success_chance:
+            failed_thieving_count += 1
+            # Same draws as random.randint(min_damage, max_damage)
+            damage = getrandbits(damage_bits)
+            while damage >= damage_range:
+                damage = getrandbits(damage_bits)
+            current_health -= config.min_damage + damage
+            if current_health <= 0:
+                break
+            regen_from = time + 30
+            next_time = time + stunned_period
+            if next_time >= end:
+                time = max(end, time + 31)
+                break
+        else:
+            success_thieving_count += 1
+            gold = getrandbits(gold_bits)
+            while gold >= gold_range:
+                gold = getrandbits(gold_bits)
+            gold_earn += config.min_gold + gold
+            regen_from = time
+            next_time = time + steal_period
+            if next_time >= end:
+                time = end
+                break
+
+        # Regeneration ticks that happen before the next attempt
+        regen_ticks = (next_time - 1) // regen_period - (regen_from - 1) // regen_period
+        if regen_ticks:
+            current_health = min(
+                current_health + regen_ticks * config.health_regeneration_amount, config.max_health
+            )
+        time = next_time
+
+    return ThievingSimResult(
+        time / 10,
+        gold_earn,
+        success_thieving_count,
+        failed_thieving_count,
+        thieving_count,
+    )
+
+
+def simulate_thieving_batch(
+        config: ThievingSimConfig, n: int, streams: SimulationStreams | None = None
+) -> ThievingSimBatch:
+    """Run ``n`` independent thieves of ``sim_events`` in lockstep.
+
+    Each loop iteration performs one steal attempt in every lane that is still
+    running; every thief draws two words per attempt from its own stream in ``streams``.
+    """
+    streams = streams or SimulationStreams()
+    counters = instrumentation.current()
+    steal_period = _deciseconds(config.steal_interval)
+    regen_period = _deciseconds(config.health_regeneration_interval)
+    stunned_period = -(-31 // steal_period) * steal_period
+    end = 60 * 60 * 8 * 10
+
+    result = ThievingSimBatch(
+        time=np.zeros(n, dtype=np.float64),
+        money_earned=np.zeros(n, dtype=np.int64),
+        success_thieving_count=np.zeros(n, dtype=np.int64),
+        failed_thieving_count=np.zeros(n, dtype=np.int64),
+        thieving_count=np.zeros(n, dtype=np.int64),
+    )
+
+    lanes = np.arange(n)
+    keys = streams.keys(n)
+    step = 0
+    current_health = np.full(n, config.max_health, dtype=np.int64)
+    gold_earn = np.zeros(n, dtype=np.int64)
+    success_thieving_count = np.zeros(n, dtype=np.int64)
+    failed_thieving_count = np.zeros(n, dtype=np.int64)
+    time = np.zeros(n, dtype=np.int64)
+
+    while lanes.size:
+        cancellation.check()
+        m = lanes.size
+        attempt_words = streams.draw(keys, 2 * step)
+        gold_words = streams.draw(keys, 2 * step + 1)
+        step += 1
+        failed = rng.uniform(attempt_words) > config.steal_success_chance
+        damage = rng.integers(attempt_words, config.min_damage, config.max_damage + 1)
+        gold = rng.integers(gold_words, config.min_gold, config.max_gold + 1)
+
+        failed_thieving_count += failed
+        success_thieving_count += ~failed
+        current_health -= np.where(failed, damage, 0)
+        gold_earn += np.where(failed, 0, gold)
+        dead = failed & (current_health <= 0)
+
+        next_time = np.where(failed, time + stunned_period, time + steal_period)
+        regen_from = np.where(failed, time + 30, time)
+        regen_ticks = (next_time - 1) // regen_period - (regen_from - 1) // regen_period
+        np.minimum(
+            current_health + regen_ticks * config.health_regeneration_amount, config.max_health,
+            out=current_health, where=~dead,
+        )
+        if counters is not None:
+            # Thieves never respawn, a failed attempt stuns them instead
+            counters.count(
+                loop_iterations=m, rng_draws=3 * m, regen_ticks=int(regen_ticks[~dead].sum()), stuns=int(failed.sum())
+            )
+
+        timed_out = ~dead & (next_time >= end)
+        end_time = np.where(failed, np.maximum(end, time + 31), end)
+        time = np.where(dead, time, np.where(timed_out, end_time, next_time))
+
+        done = dead | timed_out
+        if done.any():
+            finished = lanes[done]
+            result.time[finished] = time[done] / 10
+            result.money_earned[finished] = gold_earn[done]
+            result.success_thieving_count[finished] = success_thieving_count[done]
+            result.failed_thieving_count[finished] = failed_thieving_count[done]
+            keep = ~done
+            lanes = lanes[keep]
+            keys = keys[keep]
+            current_health = current_health[keep]
+            gold_earn = gold_earn[keep]
+            success_thieving_count = success_thieving_count[keep]
+            failed_thieving_count = failed_thieving_count[keep]
+            time = time[keep]
+
+    result.thieving_count[:] = result.success_thieving_count + result.failed_thieving_count
+    return result
+
+
+def _push_forward(
+        config: ThievingSimConfig,
+        rows: int,
+        fail: Callable[[int, np.ndarray], tuple[int, np.ndarray]],
+        absorb: Callable[[int, int, int, np.ndarray], None],
+        trim_rows: bool,
+        cell_limit: float = math.inf,
+) -> bool:
+    """Push the probability mass of ``sim`` forward attempt time by attempt time until death or the 8h cap.
+
+    A state is (row offset, health of column 0, masses by row and health), one
+    per attempt time. Column 0 never holds mass: damage that reaches it is a
+    death, or cannot happen within the band of health kept. Rows start as the
+    unit vector of ``rows`` and ``fail`` maps the offset and rows of the mass
+    that fails an attempt. ``absorb(end time, next attempt time, offset, mass
+    by row)`` takes the mass that leaves by death or the cap. Rows (if
+    ``trim_rows``) and low health columns without mass are trimmed. Returns
+    False, having stopped, once more than ``cell_limit`` cells were pushed.
+    """
+    steal_period = _deciseconds(config.steal_interval)
+    regen_period = _deciseconds(config.health_regeneration_interval)
+    stunned_period = -(-31 // steal_period) * steal_period
+    end = 60 * 60 * 8 * 10
+    success = min(max(config.steal_success_chance, 0.0), 1.0)
+
+    def regen_ticks(regen_from: int, next_time: int) -> int:
+        return (next_time - 1) // regen_period - (regen_from - 1) // regen_period
+
+    def damage(masses: np.ndarray, base: int) -> tuple[np.ndarray, int]:
+        # Widen the band down by the largest hit; below health 0 the mass is removed as dead
+        new_base = max(base - config.max_damage, 0)
+        widened = np.zeros((len(masses), masses.shape[1] + base - new_base))
+        widened[:, base - new_base:] = masses
+        return apply_uniform_damage(widened, config.min_damage, config.max_damage), new_base
+
+    def schedule(time: int, offset: int, base: int, masses: np.ndarray):
+        total = masses[0] if not trim_rows else masses.sum(axis=0)
+        if total.sum() < 1e-15:
+            return
+        if trim_rows:
+            alive = np.flatnonzero(np.cumsum(masses.sum(axis=1)) > 1e-16)
+            alive_to = len(masses) - np.flatnonzero(np.cumsum(masses.sum(axis=1)[::-1]) > 1e-16)[0]
+            masses = masses[alive[0]:alive_to]
+            offset += int(alive[0])
+        cut = max(int(np.flatnonzero(np.cumsum(total) > 1e-16)[0]) - 1, 0)
+        masses = masses[:, cut:]
+        base += cut
+        if time in pending:
+            other_offset, other_base, other = pending[time]
+            low = min(offset, other_offset)
+            high = max(offset + len(masses), other_offset + len(other))
+            low_base = min(base, other_base)
+            merged = np.zeros((high - low, config.max_health + 1 - low_base))
+            for rows_from, columns_from, block in ((offset, base, masses), (other_offset, other_base, other)):
+                merged[rows_from - low:rows_from - low + len(block), columns_from - low_base:] += block
+            offset, base, masses = low, low_base, merged
+        pending[time] = offset, base, masses
+
+    start = np.zeros((rows, 2))
+    start[0, 1] = 1.0
+    pending: dict[int, tuple[int, int, np.ndarray]] = {0: (0, config.max_health - 1, start)}
+    cells = 0
+    for time in range(0, end, steal_period):
+        if time not in pending:
+            continue
+        cancellation.check()
+        offset, base, state = pending.pop(time)
+        cells += state.size
+        if cells > cell_limit:
+            return False
+
+        hit_offset, hit = fail(offset, (1 - success) * state)
+        survived, survived_base = damage(hit, base)
+        absorb(time, time + stunned_period, hit_offset, hit.sum(axis=1) - survived.sum(axis=1))
+
+        for masses_offset, masses, masses_base, regen_from, next_time, end_time in (
+                (offset, success * state, base, time, time + steal_period, end),
+                (hit_offset, survived, survived_base, time + 30, time + stunned_period, max(end, time + 31)),
+        ):
+            if next_time >= end:
+                absorb(end_time, next_time, masses_offset, masses.sum(axis=1))
+                continue
+            masses = apply_regeneration(masses, regen_ticks(regen_from, next_time) * config.health_regeneration_amount)
+            schedule(next_time, masses_offset, masses_base, masses)
+    return True
+
+
+def sim_analytic(config: ThievingSimConfig, count: int = 5000) -> BatchStats:
+    """Exact distribution of ``sim`` outcomes, without sampling.
+
+    The state at a steal attempt is (time, health) and attempts only happen on
+    the steal grid, so probability mass is pushed forward attempt time by
+    attempt time until it is absorbed by death or the 8h cap. The successful
+    attempts follow from the time and the failed ones. While the state split by
+    failed attempts stays within ``ANALYTIC_CELL_LIMIT``, the attempt counters
+    get their exact distributions; beyond it only the first two moments of the
+    failure count are carried, and the counters get their exact mean and std
+    (ExactMoments). ``time`` always gets its exact distribution. Gold depends
+    on every draw, so ``money_earned`` only has its exact mean, std and range.
+    ``count`` is the Monte Carlo size the 500 best/worst tail means refer to.
+    """
+    steal_period = _deciseconds(config.steal_interval)
+    stunned_period = -(-31 // steal_period) * steal_period
+    gold_mean = (config.min_gold + config.max_gold) / 2
+    gold_variance = ((config.max_gold - config.min_gold + 1) ** 2 - 1) / 12
+
+    def money(successes_mean: float, successes_variance: float, minimum: float, maximum: float) -> ExactMoments:
+        # Gold is a sum of ``successes`` independent uniform draws
+        return ExactMoments(
+            mean=gold_mean * successes_mean,
+            variance=gold_variance * successes_mean + gold_mean ** 2 * successes_variance,
+            minimum=minimum,
+            maximum=maximum,
+            count=count,
+        )
+
+    # Exact distributions: one row per failure count, (end time, successes, failures) -> probability
+    outcomes: dict[tuple[int, int, int], float] = {}
+
+    def absorb_outcomes(time: int, next_time: int, offset: int, masses: np.ndarray):
+        fails = np.arange(offset, offset + len(masses))
+        successes = (next_time - fails * stunned_period) // steal_period
+        for outcome in zip(successes.tolist(), fails.tolist(), masses.tolist()):
+            if outcome[2] > 0:
+                key = (time, outcome[0], outcome[1])
+                outcomes[key] = outcomes.get(key, 0.0) + outcome[2]
+
+    solved = _push_forward(
+        config, 1, lambda offset, masses: (offset + 1, masses), absorb_outcomes, trim_rows=True,
+        cell_limit=ANALYTIC_CELL_LIMIT,
+    )
+    if solved:
+        ends, successes, fails = (np.array(column) for column in zip(*outcomes))
+        probabilities = np.array(list(outcomes.values()))
+        probabilities /= probabilities.sum()
+        successes_mean = float(successes @ probabilities)
+        successes_variance = float(((successes - successes_mean) ** 2) @ probabilities)
+        money_earned = money(successes_mean, successes_variance, float(successes.min() * config.min_gold),
+                             float(successes.max() * config.max_gold))
+        return BatchStats.from_columns({
+            "time": DiscreteDistribution(ends / 10, probabilities, count),
+            "money_earned": money_earned,
+            "success_thieving_count": DiscreteDistribution(successes, probabilities, count),
+            "failed_thieving_count": DiscreteDistribution(fails, probabilities, count),
+            "thieving_count": DiscreteDistribution(successes + fails, probabilities, count),
+        })
+
+    # Moments only: rows are p, f p and f**2 p for the failure count f; a failure maps f to f + 1
+    raise_failures = np.array([[1.0, 0.0, 0.0], [1.0, 1.0, 0.0], [1.0, 2.0, 1.0]])
+    # (end time, next attempt time) -> summed rows
+    moments: dict[tuple[int, int], np.ndarray] = {}
+
+    def absorb_moments(time: int, next_time: int, offset: int, masses: np.ndarray):
+        key = (time, next_time)
+        moments[key] = moments.get(key, 0.0) + masses
+
+    _push_forward(config, 3, lambda offset, masses: (offset, np.tensordot(raise_failures, masses, 1)),
+                  absorb_moments, trim_rows=False)
+    keys = np.array(list(moments))
+    ends, next_times = keys[:, 0], keys[:, 1].astype(np.float64)
+    probability, fails_sum, fails_squares = np.array(list(moments.values())).T
+    total = probability.sum()
+    # Per key successes are (next_time - f * stunned_period) / steal_period, linear in f
+    successes_sum = (next_times * probability - stunned_period * fails_sum) / steal_period
+    successes_squares = (
+        next_times ** 2 * probability - 2 * stunned_period * next_times * fails_sum
+        + stunned_period ** 2 * fails_squares
+    ) / steal_period ** 2
+    attempts_sum = successes_sum + fails_sum
+    attempts_squares = successes_squares + fails_squares + 2 * (
+        next_times * fails_sum - stunned_period * fails_squares
+    ) / steal_period
+
+    def exact_moments(first: np.ndarray, second: np.ndarray, minimum: float, maximum: float) -> ExactMoments:
+        mean = first.sum() / total
+        return ExactMoments(mean, max(second.sum() / total - mean ** 2, 0.0), minimum, maximum, count)
+
+    time_probabilities = {}
+    for end_time, p in zip(ends.tolist(), probability.tolist()):
+        time_probabilities[end_time] = time_probabilities.get(end_time, 0.0) + p
+    most_attempts = float(np.ceil(ends.max() / steal_period))
+    successes = exact_moments(successes_sum, successes_squares, math.nan, math.nan)
+    return BatchStats.from_columns({
+        "time": DiscreteDistribution(
+            np.array(list(time_probabilities)) / 10, np.array(list(time_probabilities.values())) / total, count
+        ),
+        "money_earned": money(successes.mean, successes.variance, 0.0 if config.min_gold == 0 else math.nan,
+                              most_attempts * config.max_gold),
+        "success_thieving_count": successes,
+        "failed_thieving_count": exact_moments(fails_sum, fails_squares, math.nan, math.nan),
+        "thieving_count": exact_moments(attempts_sum, attempts_squares, math.nan, math.nan),
+    })
+
+
+def _scalar_batch(
+        engine, config: ThievingSimConfig, n: int, streams: SimulationStreams | None = None
+) -> ThievingSimBatch:
+    """Adapt a single-run engine driven by the ``random`` module to the batch signature."""
+    return ThievingSimBatch.from_results(seeded_runs(engine, config, n, streams))
+
+
+# Batch engines selectable from the GUI
+ENGINES = {
+    "batch": simulate_thieving_batch,
+    "events": partial(_scalar_batch, sim_events),
+    "ticks": partial(_scalar_batch, sim),
+}
+
+
+def _format_amount(value: float) -> str:
+    return "n/a (exact mean only)" if math.isnan(value) else str(int(value))
+
+
+def format_thieve_results(results: list[ThievingSimResult] | ThievingSimBatch | BatchStats) -> str:
+    if not isinstance(results, BatchStats):
+        if not isinstance(results, ThievingSimBatch):
+            results = ThievingSimBatch.from_results(results)
+        results = BatchStats.from_batch(results)
+    sims_seconds = results.time
+    sims_money_earned = results.money_earned
+    success_thieving_count_mean = results.success_thieving_count.mean
+    failed_thieving_count_mean = results.failed_thieving_count.mean
+    thieving_count_mean = results.thieving_count.mean
 
-    mean_time = sec_to_time(int(np.mean(sims_seconds)))
-    mean_money_earned = int(np.mean(sims_money_earned))
+    mean_time = sec_to_time(int(sims_seconds.mean))
+    mean_money_earned = int(sims_money_earned.mean)
 
-    min_mean_time = sec_to_time(int(np.mean(sorted(sims_seconds)[:500])))
-    min_money_earned = int(np.mean(sorted(sims_money_earned)[:500]))
+    min_mean_time = sec_to_time(int(sims_seconds.lowest_mean(500)))
+    # The analytic engine knows only the moments of the gold earned, not its tails
+    min_money_earned = _format_amount(sims_money_earned.lowest_mean(500))
 
-    max_mean_time = sec_to_time(int(np.mean(list(reversed(sorted(sims_seconds)))[:500])))
-    max_money_earned = int(np.mean(list(reversed(sorted(sims_money_earned)))[:500]))
+    max_mean_time = sec_to_time(int(sims_seconds.highest_mean(500)))
+    max_money_earned = _format_amount(sims_money_earned.highest_mean(500))
 
     # Очистка виджета вывода и вывод результатов
     return (
@@ -120,3 +564,5 @@ if __name__ == '__main__':
     for _ in tqdm(range(5_000), desc="Thieving simulation"):
         sims.append(sim(config))
     print(format_thieve_results(sims))
+    print("=" * 20)
+    print(format_thieve_results(simulate_thieving_batch(config, 5_000)))